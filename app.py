@@ -1,78 +1,76 @@
 # app.py
+import os
 import streamlit as st
-import pandas as pd
-import joblib
-from visa_rules_engine import (
+# Scoring core (rule sets, status thresholds, model features/inference) without heavy imports
+from visa_scoring import (
+    RULE_SETS as SCORING_RULE_SETS,
     SKILLED_WORKER_RULES, 
-    STUDENT_VISA_RULES, 
-    TOURIST_VISA_RULES,
-    evaluate_applicant
+    PASS_SCORE,
+    BORDERLINE_SCORE,
+    classify_status,
+    predict_probability,
 )
-import plotly.graph_objects as go
-import google.generativeai as genai
+from gemini_analysis import FakeGenerativeModel, stream_analysis
+from visa_memo import AssessmentMemo
+from visa_incremental import IncrementalEvaluator, what_if
+from visa_instrumentation import instrumentation
+from visa_resources import resources, get_scoring_model, get_score_table, get_gemini_model, get_analysis_cache as get_resource_analysis_cache
 
 # --- Page Config ---
 st.set_page_config(page_title="Intelligent Visa Eligibility System", layout="wide", page_icon="🛂")
 
-# --- Define the feature order - MUST MATCH train_visa_model.py ---
-FEATURE_ORDER = [
-    'total_points', 'num_mandatory_failures', 'num_warning_flags',
-    'points_age', 'points_education', 'points_language', 'points_work', 'points_bonus'
-]
-
 # --- API & Model Loading ---
+# Both come from the process-wide resource layer, so reruns and other sessions reuse them instead of
+# unpickling the forest / reconfiguring the client on every widget interaction.
 try:
     api_key = st.secrets["GOOGLE_API_KEY"]
-    genai.configure(api_key=api_key); gemini_model = genai.GenerativeModel('gemini-1.5-flash')
+    gemini_model = get_gemini_model(api_key)
 except Exception:
-    st.warning("Google API Key not found. Generative AI analysis is disabled."); gemini_model = None
+    if os.environ.get("VISA_FAKE_GEMINI"): gemini_model = resources.get("gemini:fake", lambda: FakeGenerativeModel(delay=0.05))  # offline demo / testing
+    else: st.warning("Google API Key not found. Generative AI analysis is disabled."); gemini_model = None
 try:
-    model = joblib.load('visa_model.joblib')
+    # Prefer the flat-array export: loads in milliseconds and scores one row (or a what-if sweep) without DataFrame overhead
+    model = get_scoring_model('visa_model_flat', 'visa_model.joblib', batched=True)
 except Exception:
-    st.warning("ML model not found. The 'Skilled Worker' category will run on rules only."); model = None
-
-# --- Generative AI Function (Corrected with the critical fix) ---
-def get_gemini_analysis(visa_category, applicant_data, rule_output, final_status, ml_prob=None):
-    if not gemini_model: return "Generative AI analysis is disabled."
+    model = None
+if model is None: st.warning("ML model not found. The 'Skilled Worker' category will run on rules only.")
 
-    profile_details, assessment_results = "", ""
+# --- Rule Evaluation & ML Scoring ---
+RULE_SETS = dict(SCORING_RULE_SETS)
+# Student/Tourist inputs are all categorical, so their results come from precomputed tables when available
+for _category, _table in (("Student Visa", "student"), ("Tourist Visa", "tourist")):
+    try: RULE_SETS[_category] = (RULE_SETS[_category][0], get_score_table(_table).evaluate)
+    except Exception: pass
+assessment_memo = resources.get("assessment_memo", lambda: AssessmentMemo(maxsize=4096))
+incremental_evaluator = resources.get("incremental:Skilled Worker", lambda: IncrementalEvaluator(SKILLED_WORKER_RULES))
 
-    if visa_category == "Skilled Worker":
-        profile_details = f"- Age: {applicant_data.get('age', 'N/A')}\n- Education: {applicant_data.get('education_level', 'N/A')}\n- Skilled Work Experience: {applicant_data.get('work_experience_years', 'N/A')} years\n- Occupation Demand: {applicant_data.get('occupation_demand_level', 'N/A')}\n- Settlement Funds: ${applicant_data.get('settlement_funds', 0):,.0f} for a family of {applicant_data.get('family_size', 1)}"
-        
-        # --- THIS IS THE FIX ---
-        # 1. Create the formatted string for the ML probability first.
-        ml_prob_text = f"{ml_prob:.2%}" if ml_prob is not None else "N/A"
-        # 2. Use the simple text variable in the final f-string.
-        assessment_results = f"- Final System Status: {final_status}\n- Rule-Based Points Score: {rule_output.get('total_points', 0)}\n- ML Model Probability: {ml_prob_text}"
+def evaluate_skilled_worker_incrementally(applicant_data):
+    """Re-runs only the rules whose fields changed since this session's previous Skilled Worker assessment."""
+    previous = st.session_state.get("last_skilled_worker_assessment")
+    assessment = incremental_evaluator.update(previous, applicant_data) if previous is not None else incremental_evaluator.evaluate(applicant_data)
+    st.session_state["last_skilled_worker_assessment"] = assessment
+    return assessment.result
+RULE_SETS["Skilled Worker"] = (SKILLED_WORKER_RULES, evaluate_skilled_worker_incrementally)
 
-    elif visa_category == "Student Visa":
-        profile_details = f"- Academic GPA: {applicant_data.get('gpa', 'N/A')}\n- Financial Coverage: {applicant_data.get('financial_coverage', 'N/A')}\n- Language Score: {applicant_data.get('language_test_score', 'N/A')}\n- Ties to Home Country: {applicant_data.get('family_ties', 'N/A')} and {'has property' if applicant_data.get('has_property') else 'no property'}"
-        assessment_results = f"- Final System Status: {final_status}\n- Rule-Based Points Score: {rule_output.get('total_points', 0)}"
-    
-    elif visa_category == "Tourist Visa":
-        profile_details = f"- Funds per day of trip: {applicant_data.get('funds_per_day', 'N/A')}\n- Purpose of Visit: {applicant_data.get('purpose', 'N/A')}\n- Employment Status: {applicant_data.get('employment_status', 'N/A')}\n- Previous Travel History: {applicant_data.get('travel_history', 'N/A')}"
-        assessment_results = f"- Final System Status: {final_status}\n- Rule-Based Points Score: {rule_output.get('total_points', 0)}"
+def predict_eligibility(model, rule_engine_output):
+    # Features are assembled in FEATURE_ORDER by the scoring core (same order train_visa_model.py uses)
+    return predict_probability(model, rule_engine_output)
 
-    failures_text = ', '.join([f'"{item["description"]}"' for item in rule_output.get('mandatory_failures', [])]) or 'None'
-    flags_text = ', '.join([f'"{item["description"]}"' for item in rule_output.get('warning_flags', [])]) or 'None'
+# --- Generative AI Function (cached + streamed) ---
+def get_analysis_cache():
+    # One SQLite-backed cache per server process; identical assessments skip the Gemini call entirely
+    return get_resource_analysis_cache(os.environ.get("VISA_ANALYSIS_CACHE", ".gemini_cache.sqlite3"))
 
-    prompt = (f"Analyze the following applicant profile for a **{visa_category}** visa. The analysis should be for a case officer.\n\n"
-              f"**Applicant Profile:**\n{profile_details}\n\n"
-              f"**Rule-Based Assessment Results:**\n{assessment_results}\n"
-              f"- Mandatory Failures Identified: {failures_text}\n"
-              f"- Warning Flags Raised: {flags_text}\n\n"
-              f"**Your Task:**\nBased on the **{visa_category}** context, provide:\n"
-              f"1.  **Executive Summary:** A brief summary of the applicant's chances.\n"
-              f"2.  **Key Strengths:** Strongest aspects for this visa type.\n"
-              f"3.  **Key Weaknesses/Risks:** Primary concerns.\n"
-              f"4.  **Recommendation:** A final recommendation (Approve, Refuse, Further Review).")
+def get_gemini_analysis(visa_category, applicant_data, rule_output, final_status, ml_prob=None):
+    """Yields the analysis as it streams in, so the first tokens render while the rest is generated."""
+    if not gemini_model:
+        yield "Generative AI analysis is disabled."
+        return
     try:
-        response = gemini_model.generate_content(prompt)
-        return response.text
+        yield from stream_analysis(gemini_model, get_analysis_cache(), visa_category, applicant_data, rule_output, final_status, ml_prob)
     except Exception as e:
         st.error(f"Failed to get analysis from Gemini API. Error: {e}")
-        return "Could not retrieve Generative AI analysis."
+        yield "Could not retrieve Generative AI analysis."
 
 # --- Sidebar ---
 with st.sidebar:
@@ -103,28 +101,26 @@ st.title("Intelligent Visa Eligibility System")
 st.markdown("Select a category, fill in the detailed profile, and receive a comprehensive, points-based assessment.")
 
 if assess_button:
+    # Kept in the session: widgets below (the what-if toggle) trigger reruns in which the button reads False
+    st.session_state["assessment_request"] = (visa_category, dict(applicant_data))
+elif st.session_state.get("assessment_request") != (visa_category, applicant_data):
+    # The sidebar changed since the last click: drop the stale result (and skip its charts and analysis)
+    st.session_state.pop("assessment_request", None)
+
+if "assessment_request" in st.session_state:
+    import plotly.graph_objects as go  # only needed once there is a result to chart
     st.header(f"Assessment Results for: {visa_category} Visa")
     
-    eligibility_probability = None 
-    rules_to_apply = {"Skilled Worker": SKILLED_WORKER_RULES, "Student Visa": STUDENT_VISA_RULES, "Tourist Visa": TOURIST_VISA_RULES}.get(visa_category)
-    rule_engine_output = evaluate_applicant(applicant_data, rules_to_apply)
+    # Compiled counterparts of evaluate_applicant(applicant_data, <RULES>) - same output, fewer lookups
+    rules_to_apply, evaluate_rules = RULE_SETS[visa_category]
+    # Memoized per (profile, rule set); officers re-assessing a tweaked profile mostly hit the cache
+    rule_engine_output, eligibility_probability = assessment_memo.assess(
+        applicant_data, rules_to_apply, model=model if visa_category == "Skilled Worker" else None,
+        predict_fn=predict_eligibility, evaluate=evaluate_rules)
     score = rule_engine_output['total_points']
 
-    if visa_category == "Skilled Worker" and model:
-        features_dict = {
-            'total_points': score, 'num_mandatory_failures': len(rule_engine_output['mandatory_failures']), 'num_warning_flags': len(rule_engine_output['warning_flags']),
-            'points_age': rule_engine_output['points_per_category'].get('Age', 0), 'points_education': rule_engine_output['points_per_category'].get('Education', 0),
-            'points_language': rule_engine_output['points_per_category'].get('Language', 0), 'points_work': rule_engine_output['points_per_category'].get('Work Experience', 0),
-            'points_bonus': rule_engine_output['points_per_category'].get('Bonus', 0)
-        }
-        model_features_df = pd.DataFrame([features_dict])[FEATURE_ORDER]
-        eligibility_probability = model.predict_proba(model_features_df)[0][1]
-
-    PASS_SCORE, BORDERLINE_SCORE = 75, 50
-    if rule_engine_output['mandatory_failures']: status, color, score = "INELIGIBLE (MANDATORY FAILURE)", "red", 0
-    elif score >= PASS_SCORE: status, color = "LIKELY ELIGIBLE", "green"
-    elif score >= BORDERLINE_SCORE: status, color = "BORDERLINE / FURTHER REVIEW NEEDED", "orange"
-    else: status, color = "LIKELY INELIGIBLE", "red"
+    status, color = classify_status(score, bool(rule_engine_output['mandatory_failures']))
+    if rule_engine_output['mandatory_failures']: score = 0
     
     fig = go.Figure(go.Indicator(mode="gauge+number", value=score, title={'text': f"Eligibility Score: {status}"}, domain={'x': [0, 1], 'y': [0, 1]}, gauge={'axis': {'range': [None, 100]}, 'bar': {'color': color}, 'steps': [{'range': [0, BORDERLINE_SCORE], 'color': '#FF6347'}, {'range': [BORDERLINE_SCORE, PASS_SCORE], 'color': '#FFA500'}]})); st.plotly_chart(fig, use_container_width=True)
     
@@ -138,7 +134,18 @@ if assess_button:
         if rule_engine_output.get('warning_flags'): st.warning("Warning Flags Raised:"); [st.write(f"- {rule['description']}") for rule in rule_engine_output['warning_flags']]
         if not rule_engine_output.get('mandatory_failures') and not rule_engine_output.get('warning_flags'): st.success("No critical failures or warning flags were identified.")
 
+    if visa_category == "Skilled Worker" and st.toggle("What-if: show the score at every age from 18 to 60"):
+        # One vectorized pass over the age-dependent rules instead of 43 full assessments
+        sweep = what_if(applicant_data, rules_to_apply, 'age', range(18, 61), model=model, evaluator=incremental_evaluator)
+        st.line_chart(sweep['total_points'])
+        if model is not None: st.line_chart(sweep['ml_probability'])
+
     st.markdown("---"); st.subheader("🤖 Generative AI Analysis")
     with st.spinner(f"Generating holistic assessment for {visa_category}..."):
-        ai_analysis = get_gemini_analysis(visa_category, applicant_data, rule_engine_output, status, eligibility_probability)
-        st.markdown(ai_analysis)
\ No newline at end of file
+        st.write_stream(get_gemini_analysis(visa_category, applicant_data, rule_engine_output, status, eligibility_probability))
+    st.caption("Analysis cache: {hits} hits / {misses} misses ({size} stored)".format(**get_analysis_cache().stats()))
+
+with st.expander("Runtime resource stats"):
+    st.write({name: {"loads": info["loads"], "cache hits": info["hits"], "load time (s)": round(info["load_seconds"], 4)} for name, info in resources.stats().items()})
+    st.write({"assessment memo": assessment_memo.stats()})
+    if instrumentation.enabled: st.code(instrumentation.report())  # per-rule metrics (VISA_RULE_METRICS=1)
\ No newline at end of file
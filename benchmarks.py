@@ -0,0 +1,349 @@
+# benchmarks.py
+"""
+Benchmark and regression suite for the scoring hot paths.
+
+    python benchmarks.py                                   # run everything, write bench_results.json
+    python benchmarks.py --quick --filter rules.           # smaller workloads, only matching benchmarks
+    python benchmarks.py --save-baseline benchmarks_baseline.json     # on the reference commit
+    python benchmarks.py --compare benchmarks_baseline.json --threshold 0.25
+
+Workloads come from create_visa_mock_data with a fixed seed. Each benchmark reports the best and
+median seconds per call over several timed rounds. Timings only compare on the same machine, so
+baselines are recorded locally (or by CI on its runner) and are not checked in. --compare exits with
+status 1 when a benchmark's median is more than `threshold` plus the rounds' own spread slower than
+the baseline's, and stays that slow when it is re-measured.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+from create_visa_mock_data import generate_applicants
+from visa_rules_engine import SKILLED_WORKER_RULES, evaluate_applicant
+from visa_scoring import RULE_SETS as SCORING_RULE_SETS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# visa_scoring.RULE_SETS under benchmark-name keys: "skilled_worker", "student", "tourist"
+RULE_SETS = {category.replace(" Visa", "").lower().replace(" ", "_"): (category, rules, evaluator)
+             for category, (rules, evaluator) in SCORING_RULE_SETS.items()}
+BENCHMARKS = []
+
+
+def benchmark(name, rows=1):
+    """Registers `setup(size)` -> zero-argument callable; `rows` is how many applicants one call handles."""
+    def register(setup):
+        BENCHMARKS.append((name, rows, setup))
+        return setup
+    return register
+
+
+def _records(visa_category, n, seed=0):
+    return generate_applicants(n, visa_category, seed=seed).drop(columns=["is_eligible"]).to_dict("records")
+
+
+# --- Rule engine ---
+for _key, (_category, _rules, _evaluator) in RULE_SETS.items():
+    def _setup_interpreted(size, category=_category, rules=_rules):
+        records = _records(category, size["applicants"])
+        return lambda: [evaluate_applicant(r, rules) for r in records]
+
+    def _setup_compiled(size, category=_category, evaluator=_evaluator):
+        records = _records(category, size["applicants"])
+        return lambda: [evaluator(r) for r in records]
+
+    benchmark(f"rules.evaluate_applicant[{_key}]", rows="applicants")(_setup_interpreted)
+    benchmark(f"rules.compiled[{_key}]", rows="applicants")(_setup_compiled)
+
+
+@benchmark("rules.score_table[student]", rows="applicants")
+def _setup_student_table(size):
+    from score_table import load_or_build
+    table, records = load_or_build("student"), _records("Student Visa", size["applicants"])
+    return lambda: [table.evaluate(r) for r in records]
+
+
+@benchmark("rules.evaluate_batch[skilled_worker]", rows="batch")
+def _setup_batch(size):
+    from visa_batch_engine import evaluate_batch
+    df = generate_applicants(size["batch"], seed=1)
+    return lambda: evaluate_batch(df, SKILLED_WORKER_RULES)
+
+
+# --- Feature building (train_visa_model.py) ---
+@benchmark("features.build_features", rows="batch")
+def _setup_build_features(size):
+    from train_visa_model import build_features
+    df = generate_applicants(size["batch"], seed=2)
+    return lambda: build_features(df)
+
+
+# --- Model ---
+@benchmark("model.load[joblib]")
+def _setup_load_joblib(size):
+    import joblib
+    import sklearn.ensemble  # noqa: F401  (import cost is excluded)
+    return lambda: joblib.load(os.path.join(HERE, "visa_model.joblib"))
+
+
+@benchmark("model.load[flat]")
+def _setup_load_flat(size):
+    from flat_forest import FlatForest
+    return lambda: FlatForest.load(os.path.join(HERE, "visa_model_flat"))
+
+
+def _model_features(n):
+    from train_visa_model import build_features
+    return build_features(generate_applicants(n, seed=3))
+
+
+@benchmark("model.predict_proba[joblib,1]")
+def _setup_joblib_one(size):
+    import joblib
+    model, X = joblib.load(os.path.join(HERE, "visa_model.joblib")), _model_features(1)
+    return lambda: model.predict_proba(X)
+
+
+@benchmark("model.predict_proba[joblib,N]", rows="batch")
+def _setup_joblib_n(size):
+    import joblib
+    model, X = joblib.load(os.path.join(HERE, "visa_model.joblib")), _model_features(size["batch"])
+    return lambda: model.predict_proba(X)
+
+
+@benchmark("model.predict_proba[flat,1]")
+def _setup_flat_one(size):
+    from flat_forest import FlatForest
+    model, row = FlatForest.load(os.path.join(HERE, "visa_model_flat")), _model_features(1).iloc[0].tolist()
+    return lambda: model.predict_proba_one(row)
+
+
+@benchmark("model.predict_proba[flat,N]", rows="batch")
+def _setup_flat_n(size):
+    from flat_forest import FlatForest
+    model, X = FlatForest.load(os.path.join(HERE, "visa_model_flat")), _model_features(size["batch"]).to_numpy()
+    return lambda: model.predict_proba(X)
+
+
+# --- End-to-end app.py path ---
+class StreamlitStub(types.ModuleType):
+    """
+    Stands in for `streamlit` when app.py is exec'd: widgets return values drawn from `rng` within
+    their ranges/options, the Assess button is always pressed, the what-if toggle reads `what_if`
+    and output calls are no-ops.
+    """
+
+    def __init__(self, rng, category, what_if=False):
+        super().__init__("streamlit")
+        self.rng, self.category, self.what_if = rng, category, what_if
+        self.secrets = {}  # no API key: Gemini analysis is disabled
+        self.session_state = {}
+        self.sidebar = contextlib.nullcontext()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def radio(self, label, options, **kwargs):
+        return self.category
+
+    def slider(self, label, min_value, max_value, value=None, step=None):
+        return int(self.rng.integers(min_value, max_value + 1))
+
+    def number_input(self, label, min_value, max_value, value=None, step=None):
+        if isinstance(value, float):
+            return float(np.round(self.rng.uniform(min_value, max_value) / step) * step)
+        return int(self.rng.integers(min_value, max_value + 1))
+
+    def selectbox(self, label, options, **kwargs):
+        return options[self.rng.integers(len(options))]
+
+    select_slider = selectbox
+
+    def checkbox(self, label, value=False):
+        return bool(self.rng.random() < 0.5)
+
+    def button(self, *args, **kwargs):
+        return True
+
+    def toggle(self, label, value=False, **kwargs):
+        return self.what_if
+
+    def columns(self, n):
+        return [contextlib.nullcontext() for _ in range(n)]
+
+    def spinner(self, *args, **kwargs):
+        return contextlib.nullcontext()
+
+    expander = spinner
+
+    def write_stream(self, stream):
+        return ''.join(stream)
+
+
+class PlotlyStub(types.ModuleType):
+    """Stands in for `plotly` / `plotly.graph_objects`: every figure or trace constructor returns its arguments."""
+
+    def __init__(self, name="plotly.graph_objects"):
+        super().__init__(name)
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: types.SimpleNamespace(type=name, args=args, kwargs=kwargs)
+
+
+def _setup_app(category, what_if=False):
+    def setup(size):
+        path = os.path.join(HERE, "app.py")
+        with open(path, encoding="utf-8") as f:
+            code = compile(f.read(), path, "exec")
+        graph_objects = PlotlyStub()
+        plotly = PlotlyStub("plotly")
+        plotly.graph_objects = graph_objects
+        # Charts are drawn by the browser; stubbing plotly keeps the measured path the same everywhere
+        stubs = {"streamlit": StreamlitStub(np.random.default_rng(4), category, what_if),
+                 "plotly": plotly, "plotly.graph_objects": graph_objects}
+        os.environ.pop("VISA_FAKE_GEMINI", None)
+
+        def rerun():
+            previous = {name: sys.modules.get(name) for name in stubs}
+            sys.modules.update(stubs)
+            cwd = os.getcwd()
+            os.chdir(HERE)
+            try:
+                exec(code, {"__name__": "__main__", "__file__": path})
+            finally:
+                os.chdir(cwd)
+                for name, module in previous.items():
+                    if module is None:
+                        sys.modules.pop(name, None)
+                    else:
+                        sys.modules[name] = module
+        return rerun
+    return setup
+
+
+for _key, (_category, _, _) in RULE_SETS.items():
+    benchmark(f"app.assess[{_key}]")(_setup_app(_category))
+# The Skilled Worker results page with the age what-if sweep switched on
+benchmark("app.assess[skilled_worker,what_if]")(_setup_app("Skilled Worker", what_if=True))
+
+
+# --- Runner ---
+SIZES = {"full": {"applicants": 2000, "batch": 10_000}, "quick": {"applicants": 200, "batch": 1000}}
+
+
+def time_callable(fn, repeat=7, min_round_seconds=0.1):
+    """timeit-style: calibrates calls per round to last at least `min_round_seconds`, returns per-call times."""
+    fn()  # warm-up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_round_seconds or number >= 10_000:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_round_seconds / elapsed) + 1))
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def run(name_filter=None, quick=False, repeat=7, names=None):
+    size = SIZES["quick" if quick else "full"]
+    results = {}
+    for name, rows, setup in BENCHMARKS:
+        if (name_filter and name_filter not in name) or (names is not None and name not in names):
+            continue
+        fn = setup(size)
+        times, number = time_callable(fn, repeat)
+        n_rows = size[rows] if isinstance(rows, str) else rows
+        best = min(times)
+        results[name] = {"best_seconds": best, "median_seconds": statistics.median(times), "rows": n_rows,
+                         "rows_per_second": n_rows / best if best else None, "calls_per_round": number, "rounds": repeat}
+        print(f"  {name:<42} {best * 1000:>10.3f} ms/call  ({n_rows:,} rows, {n_rows / best:,.0f} rows/s)", file=sys.stderr)
+    return {"meta": environment(quick), "results": results}
+
+
+def environment(quick):
+    import sklearn
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "quick": quick, "python": platform.python_version(),
+            "platform": platform.platform(), "cpu_count": os.cpu_count(), "numpy": np.__version__,
+            "pandas": pd.__version__, "sklearn": sklearn.__version__}
+
+
+def _spread(result):
+    """How far the median round is above the best one, relative to the best: this run's own noise."""
+    return result["median_seconds"] / result["best_seconds"] - 1 if result["best_seconds"] else 0.0
+
+
+def compare(current, baseline, threshold):
+    """
+    Returns [(name, baseline_median, current_median, ratio)] for benchmarks whose median is slower than
+    the baseline median by more than `threshold` plus the larger round-to-round spread of the two runs.
+    """
+    if current["meta"]["quick"] != baseline["meta"]["quick"]:
+        print("warning: comparing quick and full workload sizes", file=sys.stderr)
+    if current["meta"]["platform"] != baseline["meta"]["platform"] or current["meta"]["cpu_count"] != baseline["meta"]["cpu_count"]:
+        print("warning: the baseline was recorded on a different machine; timings may not be comparable", file=sys.stderr)
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or "median_seconds" not in base or "median_seconds" not in result:
+            continue
+        ratio = result["median_seconds"] / base["median_seconds"]
+        allowed = 1 + threshold + max(_spread(base), _spread(result))
+        marker = "REGRESSION" if ratio > allowed else ""
+        print(f"  {name:<42} {ratio:>6.2f}x baseline (allowed {allowed:.2f}x)  {marker}", file=sys.stderr)
+        if marker:
+            regressions.append((name, base["median_seconds"], result["median_seconds"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the rules engine, model and app hot paths.")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write this run's results.")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this text.")
+    parser.add_argument("--quick", action="store_true", help="Smaller workloads for a fast smoke run.")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed rounds per benchmark.")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check against.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%).")
+    parser.add_argument("--save-baseline", default=None, help="Also write the results here as the new baseline.")
+    args = parser.parse_args(argv)
+
+    print("Running benchmarks...", file=sys.stderr)
+    current = run(args.filter, args.quick, args.repeat)
+    for path in filter(None, (args.out, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(current, f, indent=2)
+    print(f"Results saved to {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing with {args.compare} (threshold +{args.threshold:.0%}):", file=sys.stderr)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            # A one-off slow run (another process, CPU frequency change) shouldn't fail the gate: re-measure
+            names = {name for name, *_ in regressions}
+            print(f"Re-measuring {len(names)} suspected regression(s):", file=sys.stderr)
+            recheck = run(quick=args.quick, repeat=args.repeat, names=names)
+            regressions = compare(recheck, baseline, args.threshold)
+        if regressions:
+            for name, base, now, ratio in regressions:
+                print(f"FAIL {name}: {base * 1000:.3f} ms -> {now * 1000:.3f} ms ({ratio:.2f}x)", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
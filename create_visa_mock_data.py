@@ -1,67 +1,178 @@
 # create_visa_mock_data.py
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-import random
-
-def generate_applicant(is_eligible_profile):
-    """Generates a single applicant record."""
-    if is_eligible_profile:
-        # Profile for a likely eligible candidate
-        age = np.random.randint(25, 38)
-        edu_level = random.choice(['Bachelors', 'Masters', 'PhD'])
-        work_years = np.random.randint(3, 10)
-        ielts = [np.random.uniform(6.5, 8.5) for _ in range(4)]
-        family_size = np.random.randint(1, 4)
-        funds = np.random.randint(20000 + (family_size * 5000), 80000)
-        has_criminal_record = False
-        has_misrepresentation = False
-        has_previous_refusal = np.random.choice([True, False], p=[0.2, 0.8])
-        occupation_demand = random.choice(['High', 'Critical', 'Medium'])
-        has_positive_travel_history = True
-    else:
-        # Profile for a likely ineligible candidate
-        age = np.random.randint(38, 50)
-        edu_level = random.choice(['HighSchool', 'Diploma', 'Bachelors'])
-        work_years = np.random.randint(0, 4)
-        ielts = [np.random.uniform(5.0, 6.5) for _ in range(4)]
-        family_size = np.random.randint(1, 5)
-        funds = np.random.randint(5000, 20000 + (family_size * 2000))
-        has_criminal_record = np.random.choice([True, False], p=[0.3, 0.7])
-        has_misrepresentation = np.random.choice([True, False], p=[0.1, 0.9])
-        has_previous_refusal = np.random.choice([True, False], p=[0.6, 0.4])
-        occupation_demand = random.choice(['Low', 'Medium'])
-        has_positive_travel_history = np.random.choice([True, False], p=[0.4, 0.6])
-
-    return {
-        "age": age,
-        "education_level": edu_level,
-        "work_experience_years": work_years,
-        "ielts_listening": round(ielts[0], 1),
-        "ielts_reading": round(ielts[1], 1),
-        "ielts_writing": round(ielts[2], 1),
-        "ielts_speaking": round(ielts[3], 1),
-        "settlement_funds": funds,
+
+
+def _bool(rng, n, p_true):
+    """Boolean column; `p_true` may be a scalar or a per-row array."""
+    return rng.random(n) < p_true
+
+
+def _pick(rng, eligible, eligible_options, ineligible_options, eligible_p=None, ineligible_p=None):
+    """Categorical column drawn from a different distribution for eligible and ineligible rows."""
+    n = len(eligible)
+    return np.where(eligible,
+                    rng.choice(np.asarray(eligible_options, dtype=object), n, p=eligible_p),
+                    rng.choice(np.asarray(ineligible_options, dtype=object), n, p=ineligible_p))
+
+
+# --- Applicant schemas ---
+def generate_skilled_worker(rng, eligible):
+    """Skilled Worker applicants; each column is drawn for every row in one array operation."""
+    n = len(eligible)
+    family_size = np.where(eligible, rng.integers(1, 4, n), rng.integers(1, 5, n))
+    ielts = np.where(eligible[:, None], rng.uniform(6.5, 8.5, (n, 4)), rng.uniform(5.0, 6.5, (n, 4))).round(1)
+    return pd.DataFrame({
+        "age": np.where(eligible, rng.integers(25, 38, n), rng.integers(38, 50, n)),
+        "education_level": _pick(rng, eligible, ['Bachelors', 'Masters', 'PhD'], ['HighSchool', 'Diploma', 'Bachelors']),
+        "work_experience_years": np.where(eligible, rng.integers(3, 10, n), rng.integers(0, 4, n)),
+        "ielts_listening": ielts[:, 0],
+        "ielts_reading": ielts[:, 1],
+        "ielts_writing": ielts[:, 2],
+        "ielts_speaking": ielts[:, 3],
+        "settlement_funds": np.where(eligible, rng.integers(20000 + family_size * 5000, 80000),
+                                     rng.integers(5000, 20000 + family_size * 2000)),
         "family_size": family_size,
-        "occupation_demand_level": occupation_demand,
-        "has_positive_travel_history": has_positive_travel_history,
-        "has_job_offer": np.random.choice([True, False]),
-        "has_relative": np.random.choice([True, False]),
-        "spouse_language_proficient": np.random.choice([True, False]),
-        "has_local_work_experience": np.random.choice([True, False]),
-        "has_local_education": np.random.choice([True, False]),
-        "has_criminal_record": has_criminal_record,
-        "failed_medical_exam": np.random.choice([True, False], p=[0.05, 0.95]),
-        "has_misrepresentation": has_misrepresentation,
-        "has_valid_passport": np.random.choice([True, False], p=[0.98, 0.02]),
-        "has_employment_gap": np.random.choice([True, False]),
-        "has_previous_refusal": has_previous_refusal,
-        "is_eligible": 1 if is_eligible_profile else 0
-    }
-
-print("Generating enhanced mock visa applicant data...")
-applicants = [generate_applicant(is_eligible_profile=True) for _ in range(750)]
-applicants.extend([generate_applicant(is_eligible_profile=False) for _ in range(750)])
-
-df = pd.DataFrame(applicants)
-df.to_csv("visa_mock_data.csv", index=False)
-print("Data saved to visa_mock_data.csv")
\ No newline at end of file
+        "occupation_demand_level": _pick(rng, eligible, ['High', 'Critical', 'Medium'], ['Low', 'Medium']),
+        "has_positive_travel_history": eligible | _bool(rng, n, 0.4),
+        "has_job_offer": _bool(rng, n, 0.5),
+        "has_relative": _bool(rng, n, 0.5),
+        "spouse_language_proficient": _bool(rng, n, 0.5),
+        "has_local_work_experience": _bool(rng, n, 0.5),
+        "has_local_education": _bool(rng, n, 0.5),
+        "has_criminal_record": ~eligible & _bool(rng, n, 0.3),
+        "failed_medical_exam": _bool(rng, n, 0.05),
+        "has_misrepresentation": ~eligible & _bool(rng, n, 0.1),
+        "has_valid_passport": _bool(rng, n, 0.98),
+        "has_employment_gap": _bool(rng, n, 0.5),
+        "has_previous_refusal": _bool(rng, n, np.where(eligible, 0.2, 0.6)),
+        "is_eligible": eligible.astype(int),
+    })
+
+
+def generate_student(rng, eligible):
+    """Student Visa applicants with the fields collected by the app's Student form."""
+    n = len(eligible)
+    return pd.DataFrame({
+        "has_loa": _bool(rng, n, np.where(eligible, 0.98, 0.6)),
+        "gpa": _pick(rng, eligible, ['> 3.5', '3.0 - 3.5', '2.5 - 3.0'], ['3.0 - 3.5', '2.5 - 3.0', '< 2.5']),
+        "study_gap": _pick(rng, eligible, ['< 1 year', '1 - 3 years'], ['< 1 year', '1 - 3 years', '> 3 years'], [0.7, 0.3], [0.3, 0.3, 0.4]),
+        "is_course_relevant": _bool(rng, n, np.where(eligible, 0.9, 0.4)),
+        "financial_coverage": _pick(rng, eligible, ['> 150%', '100% - 150%', '100% (Minimum)'], ['100% - 150%', '100% (Minimum)', '< 100%'],
+                                    [0.4, 0.5, 0.1], [0.2, 0.3, 0.5]),
+        "language_test_score": _pick(rng, eligible, ['High (IELTS 7+)', 'Good (IELTS 6.5)', 'Adequate (IELTS 6.0)'],
+                                     ['Good (IELTS 6.5)', 'Adequate (IELTS 6.0)', 'Low (IELTS < 6.0)']),
+        "family_ties": _pick(rng, eligible, ['Immediate family', 'Extended family'], ['Immediate family', 'Extended family', 'None']),
+        "has_property": _bool(rng, n, np.where(eligible, 0.6, 0.2)),
+        "has_job_prospects": _bool(rng, n, np.where(eligible, 0.5, 0.15)),
+        "has_misrepresentation": ~eligible & _bool(rng, n, 0.1),
+        "has_previous_refusal": _bool(rng, n, np.where(eligible, 0.1, 0.5)),
+        "is_eligible": eligible.astype(int),
+    })
+
+
+def generate_tourist(rng, eligible):
+    """Tourist Visa applicants with the fields collected by the app's Tourist form."""
+    n = len(eligible)
+    return pd.DataFrame({
+        "trip_duration": np.where(eligible, rng.integers(3, 31, n), rng.integers(7, 91, n)),
+        "funds_per_day": _pick(rng, eligible, ['> $300', '$200 - $300', '$100 - $200'], ['$200 - $300', '$100 - $200', '< $100']),
+        "purpose": _pick(rng, eligible, ['Tourism (detailed itinerary)', 'Visiting Family (with invitation)', 'Tourism (basic plan)'],
+                         ['Tourism (basic plan)', 'Other']),
+        "employment_status": _pick(rng, eligible, ['Stable full-time job', 'Part-time / Self-employed'], ['Part-time / Self-employed', 'Unemployed/Student'],
+                                   [0.8, 0.2], [0.4, 0.6]),
+        "family_ties": _pick(rng, eligible, ['Spouse and/or children', 'Parents / Siblings'], ['Parents / Siblings', 'None']),
+        "has_property": _bool(rng, n, np.where(eligible, 0.6, 0.15)),
+        "travel_history": _pick(rng, eligible, ['Extensive (USA/UK/Schengen)', 'Some regional travel'], ['Some regional travel', 'None'],
+                                [0.5, 0.5], [0.3, 0.7]),
+        "has_host_or_booking": _bool(rng, n, np.where(eligible, 0.95, 0.5)),
+        "has_criminal_record": ~eligible & _bool(rng, n, 0.15),
+        "has_misrepresentation": ~eligible & _bool(rng, n, 0.1),
+        "has_previous_refusal": _bool(rng, n, np.where(eligible, 0.1, 0.5)),
+        "is_eligible": eligible.astype(int),
+    })
+
+
+GENERATORS = {"Skilled Worker": generate_skilled_worker, "Student Visa": generate_student, "Tourist Visa": generate_tourist}
+
+
+def generate_applicants(n_rows, visa_category="Skilled Worker", eligible_ratio=0.5, seed=None, with_category=False):
+    """
+    Generates `n_rows` applicants of one visa category. The first round(n_rows * eligible_ratio)
+    rows are eligible profiles, the rest ineligible (the same layout as the original mock file).
+    `seed` may be an int or a numpy SeedSequence.
+    """
+    rng = np.random.default_rng(seed)
+    eligible = np.arange(n_rows) < round(n_rows * eligible_ratio)
+    df = GENERATORS[visa_category](rng, eligible)
+    if with_category:
+        df.insert(0, "visa_category", visa_category)
+    return df
+
+
+# --- Partitioned output ---
+def _write(df, path):
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)  # requires pyarrow (or fastparquet)
+    else:
+        df.to_csv(path, index=False)
+
+
+def _generate_partition(task):
+    path, n_rows, visa_category, eligible_ratio, seed, with_category = task
+    _write(generate_applicants(n_rows, visa_category, eligible_ratio, seed, with_category), path)
+    return path, n_rows
+
+
+def write_partitioned(out_dir, n_rows, visa_category="Skilled Worker", eligible_ratio=0.5, seed=None,
+                      rows_per_partition=1_000_000, fmt="csv", workers=None, with_category=False):
+    """
+    Writes `n_rows` applicants as `part-NNNNN.<fmt>` files in `out_dir`, one process per partition.
+    Each partition gets its own child seed, so output depends only on the seed and the partitioning.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    n_parts = max(1, -(-n_rows // rows_per_partition))
+    seeds = np.random.SeedSequence(seed).spawn(n_parts)
+    tasks = [(os.path.join(out_dir, f"part-{i:05d}.{fmt}"), min(rows_per_partition, n_rows - i * rows_per_partition),
+              visa_category, eligible_ratio, seeds[i], with_category) for i in range(n_parts)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_generate_partition, tasks))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic visa applicant data.")
+    parser.add_argument("--rows", type=int, default=1500)
+    parser.add_argument("--category", choices=list(GENERATORS), default="Skilled Worker")
+    parser.add_argument("--eligible-ratio", type=float, default=0.5, help="Fraction of eligible profiles.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--out", default="visa_mock_data.csv",
+                        help="Output file, or a directory of partitions when --rows-per-partition is given.")
+    parser.add_argument("--rows-per-partition", type=int, default=None)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Partition file format.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--with-category", action="store_true", help="Add a visa_category column (for score_applicants.py).")
+    args = parser.parse_args(argv)
+    if args.format == "parquet" or args.out.endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Writing Parquet requires pyarrow (pip install pyarrow).")
+
+    print(f"Generating {args.rows:,} mock {args.category} applicants...")
+    start = time.perf_counter()
+    if args.rows_per_partition:
+        parts = write_partitioned(args.out, args.rows, args.category, args.eligible_ratio, args.seed,
+                                  args.rows_per_partition, args.format, args.workers, args.with_category)
+        print(f"Data saved to {len(parts)} partitions in {args.out}/ ({time.perf_counter() - start:.1f}s)")
+    else:
+        _write(generate_applicants(args.rows, args.category, args.eligible_ratio, args.seed, args.with_category), args.out)
+        print(f"Data saved to {args.out} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
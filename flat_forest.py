@@ -0,0 +1,181 @@
+# flat_forest.py
+import json
+import os
+import time
+
+import numpy as np
+
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+# --- Export ---
+def export_flat_forest(model, path, feature_names=None):
+    """
+    Flattens a fitted sklearn RandomForestClassifier into packed NumPy arrays saved as one `.npy`
+    per array under `path` (memory-mappable) plus `meta.json`. Leaves point at themselves and hold
+    their normalized class probabilities, so traversal is a fixed number of gather steps.
+
+    Every file is written under a temporary name and moved into place with `os.replace`, so processes
+    that still have the previous export memory-mapped keep reading the old files, and `meta.json` goes
+    last: a reload triggered by its mtime never sees half-written arrays.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        own = np.arange(offset, offset + n)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+        rights.append(np.where(is_leaf, own, tree.children_right + offset))
+        value = tree.value[:, 0, :]
+        values.append(value / value.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        offset += n
+        max_depth = max(max_depth, tree.max_depth)
+
+    os.makedirs(path, exist_ok=True)
+    arrays = {
+        "feature": np.concatenate(features).astype(np.int32), "threshold": np.concatenate(thresholds).astype(np.float64),
+        "left": np.concatenate(lefts).astype(np.int32), "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values).astype(np.float64), "roots": np.asarray(roots, dtype=np.int32),
+    }
+    for name, array in arrays.items():
+        _write_atomically(path, f"{name}.npy", lambda f, array=array: np.save(f, array))
+    names = list(feature_names) if feature_names is not None else list(getattr(model, "feature_names_in_", []))
+    meta = {"classes": [c.item() if hasattr(c, "item") else c for c in model.classes_], "max_depth": int(max_depth),
+            "n_trees": len(roots), "n_nodes": int(offset), "feature_names": names}
+    _write_atomically(path, "meta.json", lambda f: f.write(json.dumps(meta, indent=2).encode()))
+    return meta
+
+
+def _write_atomically(directory, name, write):
+    """Writes `name` via a temporary file in the same directory and swaps it in, never truncating the old file."""
+    tmp = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, os.path.join(directory, name))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# --- Inference ---
+class FlatForest:
+    """Lightweight predictor over an exported forest; `predict_proba` matches sklearn's output."""
+
+    # Below this many rows all trees advance together; above it, trees are walked one at a time
+    ALL_TREES_MAX_ROWS = 64
+
+    def __init__(self, arrays, meta):
+        self.feature, self.threshold = arrays["feature"], arrays["threshold"]
+        self.left, self.right = arrays["left"], arrays["right"]
+        self.value, self.roots = arrays["value"], arrays["roots"]
+        self.classes_ = np.asarray(meta["classes"])
+        self.max_depth = meta["max_depth"]
+        self.feature_names = meta["feature_names"]
+        # children[2 * node + go_right] replaces a where(left, right) per step
+        self._children = np.stack([self.left, self.right], axis=1).ravel().astype(np.intp)
+        self._feature = np.asarray(self.feature, dtype=np.intp)
+        self._roots = np.asarray(self.roots, dtype=np.intp)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS}
+        if len(arrays["feature"]) != meta["n_nodes"] or len(arrays["roots"]) != meta["n_trees"]:
+            # Only possible while a concurrent export is replacing the arrays; the caller can retry
+            raise ValueError(f"{path}: arrays don't match meta.json (export in progress?)")
+        return cls(arrays, meta)
+
+    def _proba_all_trees(self, X):
+        n, m = X.shape
+        n_trees = len(self._roots)
+        flat_X = X.ravel()
+        row_base = np.repeat(np.arange(n, dtype=np.intp) * m, n_trees)
+        node = np.tile(self._roots, n)
+        for _ in range(self.max_depth):
+            go_right = flat_X.take(row_base + self._feature.take(node)) > self.threshold.take(node)
+            node = self._children.take(2 * node + go_right)
+        return self.value.take(node, axis=0).reshape(n, n_trees, -1).sum(axis=1) / n_trees
+
+    def _proba_per_tree(self, X):
+        n = len(X)
+        by_feature = np.ascontiguousarray(X.T).ravel()
+        rows = np.arange(n, dtype=np.intp)
+        total = np.zeros((n, self.value.shape[1]))
+        for root in self._roots:
+            node = np.full(n, root, dtype=np.intp)
+            for _ in range(self.max_depth):
+                go_right = by_feature.take(self._feature.take(node) * n + rows) > self.threshold.take(node)
+                node = self._children.take(2 * node + go_right)
+            total += self.value.take(node, axis=0)
+        return total / len(self._roots)
+
+    def predict_proba(self, X):
+        """Class probabilities for a 2-D array or a DataFrame (reordered to the exported feature names)."""
+        if hasattr(X, "columns") and self.feature_names:
+            X = X[self.feature_names]
+        # sklearn compares float32 inputs against float64 thresholds; do the same for identical splits
+        X = np.asarray(X, dtype=np.float32)
+        if len(X) <= self.ALL_TREES_MAX_ROWS:
+            return self._proba_all_trees(X)
+        return self._proba_per_tree(X)
+
+    def predict_proba_one(self, row):
+        """Probability of the positive class for one feature vector (a sequence in feature order)."""
+        return float(self._proba_all_trees(np.asarray(row, dtype=np.float32)[None, :])[0, -1])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+# --- Benchmark ---
+def benchmark(joblib_path="visa_model.joblib", flat_path="visa_model_flat", repeats=200, batch_size=10_000):
+    """Compares load time and per-call latency of the joblib model and its flat export."""
+    import joblib
+
+    def timed(fn, n=1):
+        start = time.perf_counter()
+        for _ in range(n):
+            result = fn()
+        return (time.perf_counter() - start) / n, result
+
+    import sklearn.ensemble  # noqa: F401  (import cost is excluded from the load comparison)
+    joblib_load, sk_model = timed(lambda: joblib.load(joblib_path))
+    flat_load, flat_model = timed(lambda: FlatForest.load(flat_path))
+    names = flat_model.feature_names
+    rng = np.random.default_rng(0)
+    batch = rng.integers(0, 100, size=(batch_size, len(names))).astype(float)
+
+    import pandas as pd
+    one_df = pd.DataFrame(batch[:1], columns=names)
+    batch_df = pd.DataFrame(batch, columns=names)
+    results = {
+        "load_seconds": {"joblib": joblib_load, "flat": flat_load},
+        "single_row_seconds": {
+            "joblib": timed(lambda: sk_model.predict_proba(one_df), repeats)[0],
+            "flat": timed(lambda: flat_model.predict_proba_one(batch[0]), repeats)[0],
+        },
+        f"batch_{batch_size}_seconds": {
+            "joblib": timed(lambda: sk_model.predict_proba(batch_df), 3)[0],
+            "flat": timed(lambda: flat_model.predict_proba(batch), 3)[0],
+        },
+        "max_abs_difference": float(np.abs(sk_model.predict_proba(batch_df) - flat_model.predict_proba(batch)).max()),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the flat forest export against the joblib model.")
+    parser.add_argument("--joblib", default="visa_model.joblib")
+    parser.add_argument("--flat", default="visa_model_flat")
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.joblib, args.flat), indent=2))
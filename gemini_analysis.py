@@ -0,0 +1,182 @@
+# gemini_analysis.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from types import SimpleNamespace
+
+
+# --- Prompt ---
+def build_prompt(visa_category, applicant_data, rule_output, final_status, ml_prob=None):
+    """Builds the case-officer analysis prompt for one assessment."""
+    profile_details, assessment_results = "", ""
+
+    if visa_category == "Skilled Worker":
+        profile_details = f"- Age: {applicant_data.get('age', 'N/A')}\n- Education: {applicant_data.get('education_level', 'N/A')}\n- Skilled Work Experience: {applicant_data.get('work_experience_years', 'N/A')} years\n- Occupation Demand: {applicant_data.get('occupation_demand_level', 'N/A')}\n- Settlement Funds: ${applicant_data.get('settlement_funds', 0):,.0f} for a family of {applicant_data.get('family_size', 1)}"
+
+        # --- THIS IS THE FIX ---
+        # 1. Create the formatted string for the ML probability first.
+        ml_prob_text = f"{ml_prob:.2%}" if ml_prob is not None else "N/A"
+        # 2. Use the simple text variable in the final f-string.
+        assessment_results = f"- Final System Status: {final_status}\n- Rule-Based Points Score: {rule_output.get('total_points', 0)}\n- ML Model Probability: {ml_prob_text}"
+
+    elif visa_category == "Student Visa":
+        profile_details = f"- Academic GPA: {applicant_data.get('gpa', 'N/A')}\n- Financial Coverage: {applicant_data.get('financial_coverage', 'N/A')}\n- Language Score: {applicant_data.get('language_test_score', 'N/A')}\n- Ties to Home Country: {applicant_data.get('family_ties', 'N/A')} and {'has property' if applicant_data.get('has_property') else 'no property'}"
+        assessment_results = f"- Final System Status: {final_status}\n- Rule-Based Points Score: {rule_output.get('total_points', 0)}"
+
+    elif visa_category == "Tourist Visa":
+        profile_details = f"- Funds per day of trip: {applicant_data.get('funds_per_day', 'N/A')}\n- Purpose of Visit: {applicant_data.get('purpose', 'N/A')}\n- Employment Status: {applicant_data.get('employment_status', 'N/A')}\n- Previous Travel History: {applicant_data.get('travel_history', 'N/A')}"
+        assessment_results = f"- Final System Status: {final_status}\n- Rule-Based Points Score: {rule_output.get('total_points', 0)}"
+
+    failures_text = ', '.join([f'"{item["description"]}"' for item in rule_output.get('mandatory_failures', [])]) or 'None'
+    flags_text = ', '.join([f'"{item["description"]}"' for item in rule_output.get('warning_flags', [])]) or 'None'
+
+    return (f"Analyze the following applicant profile for a **{visa_category}** visa. The analysis should be for a case officer.\n\n"
+            f"**Applicant Profile:**\n{profile_details}\n\n"
+            f"**Rule-Based Assessment Results:**\n{assessment_results}\n"
+            f"- Mandatory Failures Identified: {failures_text}\n"
+            f"- Warning Flags Raised: {flags_text}\n\n"
+            f"**Your Task:**\nBased on the **{visa_category}** context, provide:\n"
+            f"1.  **Executive Summary:** A brief summary of the applicant's chances.\n"
+            f"2.  **Key Strengths:** Strongest aspects for this visa type.\n"
+            f"3.  **Key Weaknesses/Risks:** Primary concerns.\n"
+            f"4.  **Recommendation:** A final recommendation (Approve, Refuse, Further Review).")
+
+
+# --- Cache key ---
+def _normalize(value):
+    """Converts assessment inputs to plain JSON values (rules -> IDs, numpy scalars -> Python)."""
+    if isinstance(value, dict):
+        if 'id' in value and ('logic' in value or 'spec' in value):
+            return value['id']
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if hasattr(value, 'item') and callable(value.item):  # numpy scalar
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def analysis_cache_key(visa_category, applicant_data, rule_output, final_status, ml_prob=None):
+    """Stable hash of everything that shapes the prompt, independent of dict order and numpy types."""
+    payload = _normalize({
+        "visa_category": visa_category, "applicant_data": applicant_data, "status": final_status,
+        "total_points": rule_output.get('total_points'), "points_per_category": rule_output.get('points_per_category', {}),
+        "mandatory_failures": rule_output.get('mandatory_failures', []), "warning_flags": rule_output.get('warning_flags', []),
+        "ml_prob": None if ml_prob is None else round(float(ml_prob), 4),
+    })
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# --- Persistent response cache ---
+class AnalysisCache:
+    """
+    SQLite-backed cache of generated analyses with TTL expiry and least-recently-used eviction
+    beyond `max_entries`. Use path=":memory:" for a process-local cache.
+    """
+
+    def __init__(self, path=".gemini_cache.sqlite3", max_entries=1000, ttl_seconds=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS analyses (key TEXT PRIMARY KEY, text TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)")
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT text, created FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                self._db.execute("DELETE FROM analyses WHERE key = ?", (key,))
+                self._db.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE analyses SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, text):
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?)", (key, text, now, now))
+            if self.ttl_seconds is not None:
+                self.evictions += self._db.execute("DELETE FROM analyses WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+            overflow = self._db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self.evictions += self._db.execute(
+                    "DELETE FROM analyses WHERE key IN (SELECT key FROM analyses ORDER BY accessed LIMIT ?)", (overflow,)).rowcount
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM analyses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": size,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+# --- Offline stand-in for genai.GenerativeModel ---
+class FakeGenerativeModel:
+    """
+    Mimics `generate_content(prompt, stream=...)` of google.generativeai without network access.
+    Responses are deterministic per prompt; `calls` counts how many generations were requested.
+    """
+
+    def __init__(self, chunk_size=40, delay=0.0):
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.calls = 0
+
+    def _text(self, prompt):
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return (f"**Executive Summary:** Offline analysis {digest}.\n\n**Key Strengths:** See rule breakdown.\n\n"
+                f"**Key Weaknesses/Risks:** See notices above.\n\n**Recommendation:** Further Review.")
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        text = self._text(prompt)
+        if not stream:
+            time.sleep(self.delay)
+            return SimpleNamespace(text=text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        for i in range(0, len(text), self.chunk_size):
+            time.sleep(self.delay)
+            yield SimpleNamespace(text=text[i:i + self.chunk_size])
+
+
+# --- Cached, streaming analysis ---
+def stream_analysis(gemini_model, cache, visa_category, applicant_data, rule_output, final_status, ml_prob=None):
+    """
+    Yields the analysis text in chunks as the model produces them. Cached analyses are returned in a
+    single chunk without calling the model; fresh ones are cached once the stream completes.
+    """
+    key = analysis_cache_key(visa_category, applicant_data, rule_output, final_status, ml_prob)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = build_prompt(visa_category, applicant_data, rule_output, final_status, ml_prob)
+    parts = []
+    for chunk in gemini_model.generate_content(prompt, stream=True):
+        text = getattr(chunk, 'text', '') or ''
+        parts.append(text)
+        yield text
+    if cache is not None:
+        cache.put(key, ''.join(parts))
@@ -0,0 +1,147 @@
+# load_test.py
+"""
+Local load test for scoring_service.py.
+
+    python load_test.py --spawn --requests 5000 --concurrency 64
+    python load_test.py --url http://127.0.0.1:8080 --category "Student Visa"
+
+Each of `--concurrency` workers keeps one keep-alive connection and sends POST /score requests built
+from create_visa_mock_data profiles. Reports p50/p90/p99 latency and requests/sec as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+from create_visa_mock_data import GENERATORS, generate_applicants
+
+
+def build_payloads(n, categories, seed=0, analysis=False):
+    """`n` request bodies cycling through `categories`, with mock applicant profiles."""
+    per_category = -(-n // len(categories))
+    frames = {c: generate_applicants(per_category, c, seed=seed).drop(columns=["is_eligible"]) for c in categories}
+    records = {c: json.loads(frame.to_json(orient="records")) for c, frame in frames.items()}
+    payloads = []
+    for i in range(n):
+        category = categories[i % len(categories)]
+        payloads.append(json.dumps({"visa_category": category, "applicant": records[category][i // len(categories)],
+                                    "analysis": analysis}).encode())
+    return payloads
+
+
+async def _request(reader, writer, host, method, path, body=b""):
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def run_load(host, port, payloads, concurrency):
+    latencies, errors = [], 0
+    queue = iter(payloads)
+
+    async def worker():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for body in queue:
+                start = time.perf_counter()
+                status, _ = await _request(reader, writer, host, "POST", "/score", body)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, server_stats = await _request(reader, writer, host, "GET", "/stats")
+    writer.close()
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": len(latencies), "errors": errors, "concurrency": concurrency, "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "latency_ms": {"p50": round(float(np.percentile(ms, 50)), 3), "p90": round(float(np.percentile(ms, 90)), 3),
+                       "p99": round(float(np.percentile(ms, 99)), 3), "max": round(float(ms.max()), 3)},
+        "server": json.loads(server_stats).get("micro_batching"),
+    }
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn_service(port, extra_args=()):
+    """Starts scoring_service.py in a subprocess and waits until it accepts connections."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    process = subprocess.Popen([sys.executable, os.path.join(here, "scoring_service.py"), "--port", str(port), *extra_args], cwd=here)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                raise SystemExit("scoring_service.py exited during startup.")
+            time.sleep(0.1)
+    process.kill()
+    raise SystemExit("scoring_service.py did not start within 30s.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the HTTP scoring service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--spawn", action="store_true", help="Start a local scoring_service.py on a free port for the run.")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--category", action="append", choices=list(GENERATORS),
+                        help="Visa categories to send (repeatable; default: Skilled Worker).")
+    parser.add_argument("--analysis", action="store_true", help="Ask for a background Gemini analysis on every request.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-batch", type=int, default=None, help="Passed to the spawned service.")
+    parser.add_argument("--max-wait-ms", type=float, default=None, help="Passed to the spawned service.")
+    args = parser.parse_args(argv)
+
+    payloads = build_payloads(args.requests, args.category or ["Skilled Worker"], args.seed, args.analysis)
+    process = None
+    if args.spawn:
+        host, port = "127.0.0.1", _free_port()
+        extra = ["--fake-gemini"] if args.analysis else []
+        if args.max_batch is not None:
+            extra += ["--max-batch", str(args.max_batch)]
+        if args.max_wait_ms is not None:
+            extra += ["--max-wait-ms", str(args.max_wait_ms)]
+        process = spawn_service(port, extra)
+    else:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    try:
+        print(json.dumps(asyncio.run(run_load(host, port, payloads, args.concurrency)), indent=2))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
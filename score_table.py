@@ -0,0 +1,259 @@
+# score_table.py
+"""
+Precomputed results for rule sets whose inputs are all categorical / boolean.
+
+    python score_table.py build            # writes score_tables/student.npz and tourist.npz
+    python score_table.py verify           # proves every stored result equals evaluate_applicant
+
+Each profile is encoded as a mixed-radix integer over its fields' value indexes; the table maps
+that code to one of the distinct results, so `ScoreTable.evaluate` is a handful of dict lookups.
+Values outside the enumerated domains (or missing fields) fall back to the live engine.
+"""
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+from visa_rules_engine import STUDENT_VISA_RULES, TOURIST_VISA_RULES, evaluate_applicant
+from visa_rule_compiler import rules_fingerprint, spec_fields
+from visa_instrumentation import instrumentation, evaluate_instrumented
+
+BOOL = [False, True]
+
+
+class GreaterThan:
+    """Numeric domain that the rules only ever test with `value > cut`: two buckets."""
+
+    def __init__(self, cut):
+        self.cut = cut
+        self.values = [cut, cut + 1]  # representatives of `<= cut` and `> cut`
+
+    def index(self, value):
+        if isinstance(value, (bool, np.bool_)) or not isinstance(value, (int, float, np.integer, np.floating)):
+            return None
+        return int(value > self.cut)
+
+    def to_json(self):
+        return {"gt": self.cut}
+
+
+class Categorical:
+    def __init__(self, values):
+        self.values = list(values)
+        self._index = {value: i for i, value in enumerate(self.values)}
+
+    def index(self, value):
+        try:
+            return self._index.get(value)
+        except TypeError:  # unhashable
+            return None
+
+    def to_json(self):
+        return self.values
+
+
+# --- Input domains (the options offered in app.py) ---
+STUDENT_DOMAINS = {
+    'has_loa': BOOL,
+    'gpa': ['< 2.5', '2.5 - 3.0', '3.0 - 3.5', '> 3.5'],
+    'study_gap': ['< 1 year', '1 - 3 years', '> 3 years'],
+    'is_course_relevant': BOOL,
+    'financial_coverage': ['> 150%', '100% - 150%', '100% (Minimum)', '< 100%'],
+    'language_test_score': ['High (IELTS 7+)', 'Good (IELTS 6.5)', 'Adequate (IELTS 6.0)', 'Low (IELTS < 6.0)'],
+    'family_ties': ['Immediate family', 'Extended family', 'None'],
+    'has_property': BOOL, 'has_job_prospects': BOOL, 'has_misrepresentation': BOOL, 'has_previous_refusal': BOOL,
+}
+TOURIST_DOMAINS = {
+    'trip_duration': GreaterThan(30),
+    'funds_per_day': ['> $300', '$200 - $300', '$100 - $200', '< $100'],
+    'purpose': ['Tourism (detailed itinerary)', 'Visiting Family (with invitation)', 'Tourism (basic plan)', 'Other'],
+    'employment_status': ['Stable full-time job', 'Part-time / Self-employed', 'Unemployed/Student'],
+    'family_ties': ['Spouse and/or children', 'Parents / Siblings', 'None'],
+    'has_property': BOOL,
+    'travel_history': ['Extensive (USA/UK/Schengen)', 'Some regional travel', 'None'],
+    'has_host_or_booking': BOOL, 'has_criminal_record': BOOL, 'has_misrepresentation': BOOL, 'has_previous_refusal': BOOL,
+}
+
+
+def _domain(spec):
+    return spec if isinstance(spec, GreaterThan) else Categorical(spec)
+
+
+def _signature(result):
+    return (result['total_points'], tuple(result['points_per_category'].items()),
+            tuple(r['id'] for r in result['mandatory_failures']), tuple(r['id'] for r in result['warning_flags']))
+
+
+class ScoreTable:
+    """O(1) lookup of `evaluate_applicant(applicant_data, rules)` over an enumerated input space."""
+
+    def __init__(self, rules, domains, result_index, results):
+        self.rules = rules
+        self.fields = list(domains)
+        self.domains = [_domain(domains[field]) for field in self.fields]
+        sizes = [len(domain.values) for domain in self.domains]
+        self.strides = [int(np.prod(sizes[i + 1:])) for i in range(len(sizes))]
+        self.result_index = result_index
+        rules_by_id = {rule['id']: rule for rule in rules}
+        # Distinct results, stored as (total, category items, failure rules, flag rules)
+        self.results = [(total, tuple(points), [rules_by_id[i] for i in failures], [rules_by_id[i] for i in flags])
+                        for total, points, failures, flags in results]
+        self.hits = self.fallbacks = 0
+
+    @classmethod
+    def build(cls, rules, domains):
+        """Enumerates every profile in `domains` and stores its `evaluate_applicant` result."""
+        fields = list(domains)
+        read = set()
+        for rule in rules:
+            if 'spec' not in rule:
+                raise ValueError(f"Rule {rule['id']} has no declarative spec; its inputs can't be enumerated.")
+            required, optional = spec_fields(rule['spec'])
+            read |= required | set(optional)
+        if read - set(fields):
+            raise ValueError(f"Domains missing for fields: {sorted(read - set(fields))}")
+
+        values = [_domain(domains[field]).values for field in fields]
+        distinct, results = {}, []
+        index = np.empty(int(np.prod([len(v) for v in values])), dtype=np.uint32)
+        for code, combo in enumerate(itertools.product(*values)):
+            result = evaluate_applicant(dict(zip(fields, combo)), rules)
+            signature = _signature(result)
+            if signature not in distinct:
+                distinct[signature] = len(results)
+                results.append(signature)
+            index[code] = distinct[signature]
+        dtype = np.uint8 if len(results) <= 0xFF else np.uint16 if len(results) <= 0xFFFF else np.uint32
+        return cls(rules, domains, index.astype(dtype), results)
+
+    def code(self, applicant_data):
+        """Mixed-radix code of a profile, or None if any field is missing or outside its domain."""
+        code = 0
+        for field, domain, stride in zip(self.fields, self.domains, self.strides):
+            if field not in applicant_data:
+                return None
+            i = domain.index(applicant_data[field])
+            if i is None:
+                return None
+            code += i * stride
+        return code
+
+    def evaluate(self, applicant_data):
+        """Drop-in for `evaluate_applicant(applicant_data, rules)`; unsupported inputs use the live engine."""
+        if instrumentation.enabled and instrumentation.sample(self.rules):
+            return evaluate_instrumented(applicant_data, self.rules)  # sampled: run the rules for per-rule metrics
+        code = self.code(applicant_data)
+        if code is None:
+            self.fallbacks += 1
+            return evaluate_applicant(applicant_data, self.rules)
+        self.hits += 1
+        total, points, failures, flags = self.results[self.result_index[code]]
+        return {"total_points": total, "points_per_category": dict(points),
+                "mandatory_failures": list(failures), "warning_flags": list(flags)}
+
+    # --- Persistence ---
+    def save(self, path):
+        """Writes the table as compressed arrays: one row per distinct result, plus the profile -> result index."""
+        categories = list(dict.fromkeys(r.get('category', 'General') for r in self.rules if r['type'] == 'points'))
+        failure_ids = [r['id'] for r in self.rules if r['type'] == 'mandatory_fail']
+        flag_ids = [r['id'] for r in self.rules if r['type'] == 'flag']
+        n = len(self.results)
+        totals = np.zeros(n, dtype=np.int32)
+        points = np.zeros((n, len(categories)), dtype=np.int32)
+        present = np.zeros((n, len(categories)), dtype=bool)
+        failures = np.zeros((n, len(failure_ids)), dtype=bool)
+        flags = np.zeros((n, len(flag_ids)), dtype=bool)
+        for i, (total, items, failed, flagged) in enumerate(self.results):
+            if [c for c, _ in items] != [c for c in categories if c in dict(items)]:
+                raise ValueError("Result categories are not in rule order; this table can't be stored compactly.")
+            totals[i] = total
+            for category, value in items:
+                points[i, categories.index(category)] = value
+                present[i, categories.index(category)] = True
+            failures[i, [failure_ids.index(r['id']) for r in failed]] = True
+            flags[i, [flag_ids.index(r['id']) for r in flagged]] = True
+        meta = {
+            "fingerprint": rules_fingerprint(self.rules),
+            "domains": {field: domain.to_json() for field, domain in zip(self.fields, self.domains)},
+            "categories": categories, "failure_ids": failure_ids, "flag_ids": flag_ids,
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(path, result_index=self.result_index, totals=totals, points=points, present=present,
+                            failures=failures, flags=flags, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8))
+
+    @classmethod
+    def load(cls, path, rules):
+        """Loads a saved table; raises ValueError if it was built from a different version of `rules`."""
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        meta = json.loads(arrays["meta"].tobytes().decode())
+        if meta["fingerprint"] != rules_fingerprint(rules):
+            raise ValueError(f"{path} was built from different rules; rebuild it.")
+        domains = {field: GreaterThan(d["gt"]) if isinstance(d, dict) else d for field, d in meta["domains"].items()}
+        categories, failure_ids, flag_ids = meta["categories"], meta["failure_ids"], meta["flag_ids"]
+        results = [
+            (int(total), [(categories[c], int(points[c])) for c in np.flatnonzero(present)],
+             [failure_ids[i] for i in np.flatnonzero(failed)], [flag_ids[i] for i in np.flatnonzero(flagged)])
+            for total, points, present, failed, flagged
+            in zip(arrays["totals"], arrays["points"], arrays["present"], arrays["failures"], arrays["flags"])
+        ]
+        return cls(rules, domains, arrays["result_index"], results)
+
+    # --- Consistency check ---
+    def verify(self, extra_samples=()):
+        """
+        Compares every enumerated profile (and any `extra_samples`) against the live engine.
+        Returns the list of mismatching profiles; empty means the table is exact.
+        """
+        mismatches = []
+        profiles = (dict(zip(self.fields, combo)) for combo in itertools.product(*[d.values for d in self.domains]))
+        for profile in itertools.chain(profiles, extra_samples):
+            if _signature(self.evaluate(profile)) != _signature(evaluate_applicant(profile, self.rules)):
+                mismatches.append(profile)
+        return mismatches
+
+
+TABLES = {
+    "student": (STUDENT_VISA_RULES, STUDENT_DOMAINS),
+    "tourist": (TOURIST_VISA_RULES, TOURIST_DOMAINS),
+}
+
+
+def load_or_build(name, directory="score_tables"):
+    """Loads `<directory>/<name>.npz`, rebuilding (and saving) it when missing or stale."""
+    rules, domains = TABLES[name]
+    path = os.path.join(directory, f"{name}.npz")
+    try:
+        return ScoreTable.load(path, rules)
+    except (OSError, ValueError, KeyError):
+        table = ScoreTable.build(rules, domains)
+        table.save(path)
+        return table
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or verify the precomputed Student/Tourist score tables.")
+    parser.add_argument("command", choices=["build", "verify"])
+    parser.add_argument("--dir", default="score_tables")
+    args = parser.parse_args()
+
+    failed = False
+    for name, (rules, domains) in TABLES.items():
+        path = os.path.join(args.dir, f"{name}.npz")
+        if args.command == "build":
+            table = ScoreTable.build(rules, domains)
+            table.save(path)
+            print(f"{name}: {len(table.result_index):,} profiles -> {len(table.results):,} distinct results, saved to {path}")
+        else:
+            table = ScoreTable.load(path, rules)
+            # Every trip length the UI allows, plus values that must take the fallback path
+            extras = [dict(p, trip_duration=days) for p in [dict(zip(table.fields, [d.values[0] for d in table.domains]))]
+                      for days in range(0, 91)] if 'trip_duration' in table.fields else []
+            extras += [{}, {table.fields[0]: None}]
+            mismatches = table.verify(extras)
+            failed |= bool(mismatches)
+            print(f"{name}: {'OK' if not mismatches else f'{len(mismatches)} MISMATCHES'} "
+                  f"({len(table.result_index):,} profiles + {len(extras)} extra samples)")
+    sys.exit(1 if failed else 0)
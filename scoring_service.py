@@ -0,0 +1,348 @@
+# scoring_service.py
+"""
+Headless JSON scoring API (stdlib asyncio, no web framework needed).
+
+    python scoring_service.py --port 8080
+
+    POST /score            {"visa_category": "Skilled Worker", "applicant": {...}, "analysis": false}
+    GET  /analysis/<id>    Gemini analysis requested with "analysis": true (202 while pending)
+    GET  /stats            micro-batching, analysis and resource counters
+    GET  /metrics          per-rule metrics in Prometheus text format (VISA_RULE_METRICS=1 or --rule-metrics)
+    GET  /health
+
+Rule evaluation runs inline; concurrent Skilled Worker requests are merged into one predict_proba
+call per micro-batch on a dedicated inference thread. Gemini analyses run in the background on their
+own bounded thread pool, so slow or numerous analyses never delay a /score response.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from visa_scoring import RULE_SETS, classify_status, model_features, predict_probabilities
+from gemini_analysis import FakeGenerativeModel, analysis_cache_key, stream_analysis
+from visa_instrumentation import instrumentation
+from visa_resources import resources, get_scoring_model, get_score_table, get_gemini_model, get_analysis_cache
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def build_rule_sets(use_score_tables=True):
+    """{visa_category: (rules, evaluate)}: `visa_scoring.RULE_SETS`, with the score tables app.py also uses."""
+    rule_sets = dict(RULE_SETS)
+    if use_score_tables:
+        for category, table in (("Student Visa", "student"), ("Tourist Visa", "tourist")):
+            try:
+                rule_sets[category] = (rule_sets[category][0], get_score_table(table).evaluate)
+            except Exception:
+                pass
+    return rule_sets
+
+
+# --- Micro-batching ---
+class MicroBatcher:
+    """
+    Merges concurrent single-row predictions into one `predict_proba` call. The first waiting request
+    opens a batch; anything that arrives within `max_wait` seconds (up to `max_batch` rows) joins it.
+    Inference runs on the batcher's own thread (batches are sequential), so the event loop keeps
+    accepting requests meanwhile and nothing else submitted to a thread pool can queue ahead of it.
+    """
+
+    def __init__(self, model, max_batch=64, max_wait=0.002):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = self.rows = self.largest_batch = 0
+        self._queue = None
+        self._task = None
+        self._executor = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def predict(self, features):
+        """Probability of the positive class for one feature row."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((features, future))
+        return await future
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if len(batch) < self.max_batch and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+                self._drain(batch)
+            rows = [features for features, _ in batch]
+            try:
+                probabilities = await loop.run_in_executor(self._executor, predict_probabilities, self.model, rows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), probability in zip(batch, probabilities):
+                if not future.done():
+                    future.set_result(probability)
+            self.batches += 1
+            self.rows += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self):
+        return {"batches": self.batches, "rows": self.rows, "largest_batch": self.largest_batch,
+                "mean_batch": self.rows / self.batches if self.batches else 0.0,
+                "max_batch": self.max_batch, "max_wait_ms": self.max_wait * 1000}
+
+
+# --- Scoring ---
+class ScoringService:
+    """
+    Scores applicants and runs optional Gemini analyses in background tasks. At most
+    `analysis_workers` analyses call Gemini at once; the rest wait their turn without holding a thread.
+    """
+
+    def __init__(self, model=None, gemini_model=None, analysis_cache=None, rule_sets=None,
+                 max_batch=64, max_wait=0.002, max_analyses=1000, analysis_workers=4):
+        self.model = model
+        self.gemini_model = gemini_model
+        self.analysis_cache = analysis_cache
+        self.rule_sets = rule_sets if rule_sets is not None else build_rule_sets()
+        self.batcher = MicroBatcher(model, max_batch, max_wait) if model is not None else None
+        self.max_analyses = max_analyses
+        self.analysis_workers = analysis_workers
+        self.analyses = OrderedDict()  # analysis id -> {"status": ..., "text": ...}
+        self._analysis_tasks = set()
+        self._analysis_executor = None
+        self._analysis_slots = None
+        self.requests = self.errors = 0
+
+    async def start(self):
+        if self.batcher is not None:
+            self.batcher.start()
+        if self.gemini_model is not None:
+            self._analysis_executor = ThreadPoolExecutor(max_workers=self.analysis_workers, thread_name_prefix="gemini")
+            self._analysis_slots = asyncio.Semaphore(self.analysis_workers)
+
+    async def stop(self):
+        if self.batcher is not None:
+            await self.batcher.stop()
+        for task in list(self._analysis_tasks):
+            task.cancel()
+        if self._analysis_executor is not None:
+            self._analysis_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def score(self, payload):
+        """Scores one request body; raises ValueError for malformed input."""
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object.")
+        visa_category = payload.get("visa_category")
+        if visa_category not in self.rule_sets:
+            raise ValueError(f"Unknown visa_category {visa_category!r}; expected one of {sorted(self.rule_sets)}.")
+        applicant_data = payload.get("applicant")
+        if not isinstance(applicant_data, dict):
+            raise ValueError("'applicant' must be a JSON object of applicant fields.")
+
+        _, evaluate = self.rule_sets[visa_category]
+        rule_engine_output = evaluate(applicant_data)
+        has_failure = bool(rule_engine_output['mandatory_failures'])
+        status, _ = classify_status(rule_engine_output['total_points'], has_failure)
+        probability = None
+        if visa_category == "Skilled Worker" and self.batcher is not None:
+            probability = await self.batcher.predict(model_features(rule_engine_output))
+
+        response = {
+            "visa_category": visa_category,
+            "status": status,
+            "score": 0 if has_failure else rule_engine_output['total_points'],
+            "total_points": rule_engine_output['total_points'],
+            "points_per_category": rule_engine_output['points_per_category'],
+            "mandatory_failures": [{"id": r['id'], "description": r['description']} for r in rule_engine_output['mandatory_failures']],
+            "warning_flags": [{"id": r['id'], "description": r['description']} for r in rule_engine_output['warning_flags']],
+            "ml_probability": probability,
+        }
+        if payload.get("analysis"):
+            response["analysis"] = self._request_analysis(visa_category, applicant_data, rule_engine_output, status, probability)
+        return response
+
+    def _request_analysis(self, visa_category, applicant_data, rule_engine_output, status, probability):
+        if self.gemini_model is None:
+            return {"status": "disabled"}
+        analysis_id = analysis_cache_key(visa_category, applicant_data, rule_engine_output, status, probability)
+        if analysis_id not in self.analyses or self.analyses[analysis_id]["status"] == "error":
+            self.analyses[analysis_id] = {"status": "pending", "text": None}
+            while len(self.analyses) > self.max_analyses:
+                self.analyses.popitem(last=False)
+            task = asyncio.get_running_loop().create_task(
+                self._analyze(analysis_id, visa_category, applicant_data, rule_engine_output, status, probability))
+            self._analysis_tasks.add(task)
+            task.add_done_callback(self._analysis_tasks.discard)
+        return {"id": analysis_id, "status": self.analyses[analysis_id]["status"], "url": f"/analysis/{analysis_id}"}
+
+    async def _analyze(self, analysis_id, *args):
+        def generate():
+            return ''.join(stream_analysis(self.gemini_model, self.analysis_cache, *args))
+        try:
+            async with self._analysis_slots:
+                text = await asyncio.get_running_loop().run_in_executor(self._analysis_executor, generate)
+            entry = {"status": "done", "text": text}
+        except Exception as e:
+            entry = {"status": "error", "text": f"Could not retrieve Generative AI analysis: {e}"}
+        if analysis_id in self.analyses:
+            self.analyses[analysis_id] = entry
+
+    def stats(self):
+        return {
+            "requests": self.requests, "errors": self.errors,
+            "micro_batching": self.batcher.stats() if self.batcher is not None else None,
+            "analyses": {"stored": len(self.analyses), "in_flight": len(self._analysis_tasks), "workers": self.analysis_workers,
+                         "cache": self.analysis_cache.stats() if self.analysis_cache is not None else None},
+            "resources": {name: {k: v for k, v in info.items() if k != "loaded_at"} for name, info in resources.stats().items()},
+        }
+
+    # --- HTTP ---
+    async def route(self, method, path, body):
+        """Returns (HTTP status, JSON-serializable body) for one request."""
+        if path == "/health" and method == "GET":
+            return 200, {"status": "ok", "model": self.model is not None, "gemini": self.gemini_model is not None}
+        if path == "/stats" and method == "GET":
+            return 200, self.stats()
+        if path == "/metrics" and method == "GET":
+            return 200, instrumentation.to_prometheus()
+        if path == "/score":
+            if method != "POST":
+                return 405, {"error": "Use POST."}
+            self.requests += 1
+            try:
+                return 200, await self.score(json.loads(body or b"null"))
+            except (ValueError, json.JSONDecodeError) as e:
+                self.errors += 1
+                return 400, {"error": str(e)}
+        if path.startswith("/analysis/") and method == "GET":
+            entry = self.analyses.get(path[len("/analysis/"):])
+            if entry is None:
+                return 404, {"error": "Unknown analysis id."}
+            return (202 if entry["status"] == "pending" else 200), entry
+        return 404, {"error": f"No route for {method} {path}."}
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive: one JSON request/response at a time per connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await _send(writer, 400, {"error": "Malformed request line."}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await _send(writer, 413, {"error": "Request body too large."}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+                try:
+                    status, payload = await self.route(method.upper(), target.split("?", 1)[0], body)
+                except Exception as e:
+                    self.errors += 1
+                    status, payload = 500, {"error": str(e)}
+                await _send(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+async def _send(writer, status, payload, keep_alive=True):
+    """Sends `payload` as JSON, or as plain text when it is already a string (e.g. /metrics)."""
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload).encode(), "application/json"
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def serve(service, host="127.0.0.1", port=8080):
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Scoring service listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve visa eligibility scoring over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--flat-model", default="visa_model_flat", help="Flat forest export (use '' to skip).")
+    parser.add_argument("--model", default="visa_model.joblib", help="Fallback joblib model (use '' to skip).")
+    parser.add_argument("--max-batch", type=int, default=64, help="Most Skilled Worker rows per predict_proba call.")
+    parser.add_argument("--max-wait-ms", type=float, default=2.0, help="How long a batch waits for more requests.")
+    parser.add_argument("--fake-gemini", action="store_true", help="Use the offline Gemini stand-in (no API key needed).")
+    parser.add_argument("--analysis-cache", default=os.environ.get("VISA_ANALYSIS_CACHE", ".gemini_cache.sqlite3"))
+    parser.add_argument("--analysis-workers", type=int, default=4, help="Most Gemini analyses running at once.")
+    parser.add_argument("--rule-metrics", type=float, default=None, metavar="RATE",
+                        help="Collect per-rule metrics for this fraction of requests (1 = all).")
+    args = parser.parse_args(argv)
+    if args.rule_metrics:
+        instrumentation.configure(enabled=True, sample_rate=args.rule_metrics)
+
+    # The NumPy-backed flat forest scores a whole micro-batch per call
+    model = get_scoring_model(args.flat_model, args.model, batched=True)
+    if model is None:
+        print("ML model not found; Skilled Worker requests will be scored on rules only.", file=sys.stderr)
+    gemini_model = None
+    if args.fake_gemini:
+        gemini_model = FakeGenerativeModel(delay=0.05)
+    elif os.environ.get("GOOGLE_API_KEY"):
+        gemini_model = get_gemini_model(os.environ["GOOGLE_API_KEY"])
+    service = ScoringService(model, gemini_model, get_analysis_cache(args.analysis_cache) if gemini_model else None,
+                             max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000, analysis_workers=args.analysis_workers)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# tests/test_batch_engine.py
+"""
+`evaluate_batch` must give every row exactly what `evaluate_applicant` gives that row's record.
+Frames are built from the fuzz candidates of test_rule_compiler; per frame, each column is either
+fully mixed (NaN, None, wrong types - the row-by-row path), clean (the vectorized kernels), or absent.
+"""
+import random
+
+import pandas as pd
+import pytest
+
+from test_rule_compiler import RULE_SETS, _candidates
+from visa_batch_engine import evaluate_batch
+from visa_rules_engine import evaluate_applicant
+
+FRAMES_PER_RULE_SET = 200
+ROWS_PER_FRAME = 40
+_MISSING_LIKE = (None, "", "None")
+
+
+def _frames(rules, seed):
+    rng = random.Random(seed)
+    candidates = _candidates(rules)
+    for _ in range(FRAMES_PER_RULE_SET):
+        columns = {}
+        for field, values in candidates.items():
+            mode = rng.choice(["mixed", "clean", "numeric", "absent"])
+            if mode == "absent":
+                continue
+            if mode == "clean":
+                values = [v for v in values if v not in _MISSING_LIKE and v == v and not isinstance(v, (list, dict))]
+            elif mode == "numeric":
+                values = [v for v in values if type(v) in (int, float) and v == v]
+            columns[field] = [rng.choice(values) for _ in range(ROWS_PER_FRAME)]
+        yield pd.DataFrame(columns, index=range(ROWS_PER_FRAME))
+
+
+def _row_summary(batch, i):
+    failures = batch["mandatory_failures"].iloc[i]
+    flags = batch["warning_flags"].iloc[i]
+    return (int(batch["total_points"].iloc[i]),
+            {category: int(points) for category, points in batch["points_per_category"].iloc[i].items() if points},
+            sorted(failures.index[failures.to_numpy()]), sorted(flags.index[flags.to_numpy()]))
+
+
+def _summary(result):
+    return (result["total_points"], {category: points for category, points in result["points_per_category"].items() if points},
+            sorted(rule["id"] for rule in result["mandatory_failures"]), sorted(rule["id"] for rule in result["warning_flags"]))
+
+
+def test_truthiness_of_mixed_rowwise_results():
+    rules, _ = RULE_SETS["Student Visa"]
+    df = pd.DataFrame({"has_misrepresentation": [False, "unknown", float("nan")]})
+    assert evaluate_batch(df, rules)["mandatory_failures"]["ST_FAIL_MISREP"].tolist() == [False, True, True]
+
+
+@pytest.mark.parametrize("name", list(RULE_SETS))
+def test_evaluate_batch_matches_evaluate_applicant(name):
+    rules, _ = RULE_SETS[name]
+    for df in _frames(rules, seed=len(name)):
+        batch = evaluate_batch(df, rules)
+        for i, record in enumerate(df.to_dict("records")):
+            assert _row_summary(batch, i) == _summary(evaluate_applicant(record, rules)), (record, df.dtypes.to_dict())
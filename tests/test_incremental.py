@@ -0,0 +1,81 @@
+# tests/test_incremental.py
+"""
+`IncrementalEvaluator.update` and `what_if` must give exactly what `evaluate_applicant` gives the
+edited profile. Edits are drawn from the fuzz candidates of test_rule_compiler: single- and
+multi-field changes, fields removed, None, NaN and wrong types.
+"""
+import itertools
+import random
+
+import pytest
+
+import visa_incremental
+from test_rule_compiler import RULE_SETS, _ABSENT, _candidates, _profiles, _summary
+from visa_incremental import IncrementalEvaluator, what_if
+from visa_rules_engine import classify_status, evaluate_applicant, model_features
+
+EDITS_PER_RULE_SET = 3000
+SWEEPS_PER_RULE_SET = 30
+
+
+def _edit(profile, candidates, rng):
+    edited = dict(profile)
+    for field in rng.sample(sorted(candidates), rng.choice([1, 1, 1, 2, 3])):
+        value = rng.choice(candidates[field] + [_ABSENT])
+        if value is _ABSENT:
+            edited.pop(field, None)
+        else:
+            edited[field] = value
+    return edited
+
+
+@pytest.mark.parametrize("name", list(RULE_SETS))
+def test_update_matches_evaluate_applicant(name):
+    rules, _ = RULE_SETS[name]
+    rng = random.Random(len(name))
+    candidates = _candidates(rules)
+    evaluator = IncrementalEvaluator(rules)
+    profile = next(_profiles(rules, seed=len(name)))
+    assessment = evaluator.evaluate(profile)
+    for _ in range(EDITS_PER_RULE_SET):
+        edited = _edit(profile, candidates, rng)
+        expected = _summary(evaluate_applicant(edited, rules))
+        assert _summary(evaluator.update(assessment, edited).result) == expected, (profile, edited)
+        changed = [field for field in candidates if profile.get(field, _ABSENT) is not edited.get(field, _ABSENT)]
+        assert _summary(evaluator.update(assessment, edited, changed).result) == expected, (profile, edited)
+        profile, assessment = edited, evaluator.update(assessment, edited)
+
+
+@pytest.mark.parametrize("vectorized", [False, True], ids=["incremental", "vectorized"])
+@pytest.mark.parametrize("name", list(RULE_SETS))
+def test_what_if_matches_evaluate_applicant(name, vectorized, monkeypatch):
+    monkeypatch.setattr(visa_incremental, "SCALAR_SWEEP_MAX", -1 if vectorized else 10 ** 6)
+    rules, _ = RULE_SETS[name]
+    rng = random.Random(len(name))
+    candidates = _candidates(rules)
+    evaluator = IncrementalEvaluator(rules)
+    for profile in itertools.islice(_profiles(rules, seed=len(name)), SWEEPS_PER_RULE_SET):
+        field = rng.choice(sorted(candidates))
+        values = [value for value in candidates[field] if not isinstance(value, (list, dict)) and value == value]
+        sweep = what_if(profile, rules, field, values, evaluator=evaluator)
+        for i, value in enumerate(values):
+            result = evaluate_applicant(dict(profile, **{field: value}), rules)
+            row = sweep.iloc[i]
+            status, _ = classify_status(result['total_points'], bool(result['mandatory_failures']))
+            assert row['status'] == status, (profile, field, value)
+            features = dict(zip(visa_incremental.FEATURE_ORDER, model_features(result)))
+            assert {name: int(row[name]) for name in features} == features, (profile, field, value)
+            categories = {column[len("category:"):]: int(row[column]) for column in sweep.columns if column.startswith("category:")}
+            assert {category: categories.get(category, 0) for category in result['points_per_category']} == result['points_per_category']
+            assert not {category for category, points in categories.items() if points} - set(result['points_per_category'])
+
+
+@pytest.mark.parametrize("vectorized", [False, True], ids=["incremental", "vectorized"])
+def test_what_if_keeps_none_distinct_from_nan(vectorized, monkeypatch):
+    monkeypatch.setattr(visa_incremental, "SCALAR_SWEEP_MAX", -1 if vectorized else 10 ** 6)
+    rules, _ = RULE_SETS["Skilled Worker"]
+    profile = next(_profiles(rules, seed=0))
+    # NaN is truthy, None is not
+    sweep = what_if(profile, rules, "has_job_offer", [None, 1, 0], evaluator=IncrementalEvaluator(rules))
+    expected = [evaluate_applicant(dict(profile, has_job_offer=value), rules)["total_points"] for value in (None, 1, 0)]
+    assert sweep["total_points"].tolist() == expected
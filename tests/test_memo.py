@@ -0,0 +1,59 @@
+# tests/test_memo.py
+"""
+`AssessmentMemo` must never return a result computed for a rule set, spec or model that has since
+been swapped out, even when CPython hands the replacement the freed object's address.
+"""
+import types
+
+from visa_memo import AssessmentMemo
+from visa_rule_compiler import compile_logic
+from visa_rules_engine import evaluate_applicant
+
+SWAPS = 200
+APPLICANT = {"has_job_offer": True}
+
+
+def _points_rule(**fields):
+    return dict({"id": "POINTS", "type": "points", "category": "Bonus", "description": "test"}, **fields)
+
+
+def test_swapped_logic_is_never_served_stale():
+    memo = AssessmentMemo()
+    rules = [_points_rule(logic=lambda d: 0)]
+    for points in range(SWAPS):
+        rules[0]["logic"] = lambda d, points=points: points  # the previous lambda is freed here
+        rule_output, _ = memo.assess(APPLICANT, rules)
+        assert rule_output["total_points"] == points
+    assert memo.stats()["hits"] == 0
+
+
+def test_swapped_spec_is_never_served_stale():
+    memo = AssessmentMemo()
+    logic = lambda d: 0  # noqa: E731 - unchanged by the swaps; only the spec moves
+    rules = [_points_rule(logic=logic, spec=None)]
+
+    def evaluate(applicant_data):
+        return evaluate_applicant(applicant_data, [dict(rule, logic=compile_logic(rule["spec"])) for rule in rules])
+
+    for points in range(SWAPS):
+        rules[0]["spec"] = None  # free the previous spec first, so the new one may take its address
+        rules[0]["spec"] = {"kind": "if_true", "field": "has_job_offer", "points": points, "otherwise": 0}
+        rule_output, _ = memo.assess(APPLICANT, rules, evaluate=evaluate)
+        assert rule_output["total_points"] == points
+    assert memo.stats()["hits"] == 0
+
+
+def test_swapped_model_is_never_served_stale():
+    memo = AssessmentMemo()
+    rules = [_points_rule(logic=lambda d: 10)]
+
+    def predict(model, rule_output):
+        return model.probability
+
+    for i in range(SWAPS):
+        model = types.SimpleNamespace(probability=i / SWAPS)  # the previous model is only referenced by the memo
+        _, probability = memo.assess(APPLICANT, rules, model=model, predict_fn=predict)
+        assert probability == i / SWAPS
+        assert memo.assess(APPLICANT, rules, model=model, predict_fn=predict)[1] == i / SWAPS
+    assert memo.stats()["invalidations"] == SWAPS - 1
+    assert memo.stats()["hits"] == SWAPS
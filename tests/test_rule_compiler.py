@@ -0,0 +1,140 @@
+# tests/test_rule_compiler.py
+"""
+The declarative rule specs must score exactly like the hand-written lambdas they replaced.
+REFERENCE_LOGIC is the original `logic` of every rule; fuzzed profiles (missing fields, None, NaN,
+wrong types, values on and next to every threshold) are run through both.
+"""
+import math
+import random
+
+import pytest
+
+from visa_rule_compiler import build_ladder, spec_fields
+from visa_rules_engine import (
+    SKILLED_WORKER_RULES, STUDENT_VISA_RULES, TOURIST_VISA_RULES,
+    SKILLED_WORKER_EVALUATOR, STUDENT_VISA_EVALUATOR, TOURIST_VISA_EVALUATOR,
+    evaluate_applicant,
+)
+
+REFERENCE_LOGIC = {
+    "SW_AGE": lambda d: 12 if 18<=d['age']<=35 else 11 if d['age']==36 else 10 if d['age']==37 else 9 if d['age']==38 else 8 if d['age']==39 else 7 if d['age']==40 else 6 if d['age']==41 else 5 if d['age']==42 else 4 if d['age']==43 else 3 if d['age']==44 else 2 if d['age']==45 else 1 if d['age']==46 else 0,
+    "SW_EDU": lambda d: 25 if d['education_level']=='PhD' else 23 if d['education_level']=='Masters' else 22 if d['education_level']=='DualDegree' else 21 if d['education_level']=='Bachelors' else 19 if d['education_level']=='Diploma' else 5,
+    "SW_WORK": lambda d: 15 if d['work_experience_years']>=6 else 13 if 4<=d['work_experience_years']<6 else 11 if 2<=d['work_experience_years']<4 else 9 if d['work_experience_years']==1 else 0,
+    "SW_LANG_L": lambda d: 6 if d['ielts_listening']>=8.0 else 5 if d['ielts_listening']>=7.5 else 4 if d['ielts_listening']>=6.0 else 0,
+    "SW_LANG_S": lambda d: 6 if d['ielts_speaking']>=7.0 else 5 if d['ielts_speaking']>=6.5 else 4 if d['ielts_speaking']>=6.0 else 0,
+    "SW_LANG_R": lambda d: 6 if d['ielts_reading']>=7.0 else 5 if d['ielts_reading']>=6.5 else 4 if d['ielts_reading']>=6.0 else 0,
+    "SW_LANG_W": lambda d: 6 if d['ielts_writing']>=7.0 else 5 if d['ielts_writing']>=6.5 else 4 if d['ielts_writing']>=6.0 else 0,
+    "SW_JOB_OFFER": lambda d: 10 if d.get('has_job_offer') else 0,
+    "SW_DEMAND": lambda d: 8 if d.get('occupation_demand_level')=='Critical' else 5 if d.get('occupation_demand_level')=='High' else 0,
+    "SW_LOCAL_WORK": lambda d: 5 if d.get('has_local_work_experience') else 0,
+    "SW_RELATIVE": lambda d: 5 if d.get('has_relative') else 0,
+    "SW_TRAVEL_HIST": lambda d: 5 if d.get('has_positive_travel_history') else 0,
+    "SW_FAIL_FUNDS": lambda d: d['settlement_funds'] < (15000 + (d.get('family_size', 1) - 1) * 4000),
+    "SW_FAIL_CRIMINAL": lambda d: d.get('has_criminal_record'),
+    "SW_FAIL_LANG_MIN": lambda d: min(d['ielts_speaking'], d['ielts_listening'], d['ielts_reading'], d['ielts_writing']) < 6.0,
+    "SW_FLAG_FUNDS": lambda d: (15000+(d.get('family_size',1)-1)*4000) <= d['settlement_funds'] < (17000+(d.get('family_size',1)-1)*4000),
+    "SW_FLAG_REFUSAL": lambda d: d.get('has_previous_refusal'),
+    "ST_LOA": lambda d: 20 if d.get('has_loa') else -100,
+    "ST_GPA": lambda d: 10 if d.get('gpa') == '> 3.5' else 7 if d.get('gpa') == '3.0 - 3.5' else 4 if d.get('gpa') == '2.5 - 3.0' else 0,
+    "ST_FIN_COVERAGE": lambda d: 30 if d.get('financial_coverage') == '> 150%' else 20 if d.get('financial_coverage') == '100% - 150%' else 5 if d.get('financial_coverage') == '100% (Minimum)' else -100,
+    "ST_LANG_SCORE": lambda d: 15 if d.get('language_test_score') == 'High (IELTS 7+)' else 10 if d.get('language_test_score') == 'Good (IELTS 6.5)' else 5 if d.get('language_test_score') == 'Adequate (IELTS 6.0)' else 0,
+    "ST_TIES_FAMILY": lambda d: 10 if d.get('family_ties') == 'Immediate family' else 5 if d.get('family_ties') == 'Extended family' else 0,
+    "ST_TIES_PROPERTY": lambda d: 10 if d.get('has_property') else 0,
+    "ST_TIES_JOB": lambda d: 5 if d.get('has_job_prospects') else 0,
+    "ST_FAIL_MISREP": lambda d: d.get('has_misrepresentation'),
+    "ST_FLAG_STUDY_GAP": lambda d: d.get('study_gap') == '> 3 years',
+    "ST_FLAG_REFUSAL": lambda d: d.get('has_previous_refusal'),
+    "ST_FLAG_COURSE_RELEVANCE": lambda d: not d.get('is_course_relevant'),
+    "TR_FUNDS": lambda d: 30 if d.get('funds_per_day') == '> $300' else 20 if d.get('funds_per_day') == '$200 - $300' else 10 if d.get('funds_per_day') == '$100 - $200' else -100,
+    "TR_PURPOSE": lambda d: 25 if d.get('purpose') == 'Visiting Family (with invitation)' else 20 if d.get('purpose') == 'Tourism (detailed itinerary)' else 10 if d.get('purpose') == 'Tourism (basic plan)' else 5,
+    "TR_TIES_EMPLOYMENT": lambda d: 15 if d.get('employment_status') == 'Stable full-time job' else 5 if d.get('employment_status') == 'Part-time / Self-employed' else 0,
+    "TR_TIES_FAMILY": lambda d: 10 if d.get('family_ties') == 'Spouse and/or children' else 5 if d.get('family_ties') == 'Parents / Siblings' else 0,
+    "TR_TIES_PROPERTY": lambda d: 10 if d.get('has_property') else 0,
+    "TR_TRAVEL_HISTORY": lambda d: 10 if d.get('travel_history') == 'Extensive (USA/UK/Schengen)' else 5 if d.get('travel_history') == 'Some regional travel' else 0,
+    "TR_FAIL_CRIMINAL_MISREP": lambda d: d.get('has_criminal_record') or d.get('has_misrepresentation'),
+    "TR_FLAG_LONG_STAY": lambda d: d.get('trip_duration') > 30 and d.get('travel_history') != 'Extensive (USA/UK/Schengen)',
+    "TR_FLAG_NO_HOST": lambda d: not d.get('has_host_or_booking'),
+    "TR_FLAG_REFUSAL": lambda d: d.get('has_previous_refusal'),
+}
+
+RULE_SETS = {
+    "Skilled Worker": (SKILLED_WORKER_RULES, SKILLED_WORKER_EVALUATOR),
+    "Student Visa": (STUDENT_VISA_RULES, STUDENT_VISA_EVALUATOR),
+    "Tourist Visa": (TOURIST_VISA_RULES, TOURIST_VISA_EVALUATOR),
+}
+PROFILES_PER_RULE_SET = 20000
+_ABSENT = object()
+
+
+def _candidates(rules):
+    """Per field: values on and around every threshold, every table key, and assorted wrong types."""
+    junk = [None, float("nan"), "", "None", True, False, 0, 1, -1, 0.5, [1], {}]
+    candidates = {}
+    for rule in rules:
+        spec = rule["spec"]
+        required, optional = spec_fields(spec)
+        for field in required | set(optional):
+            candidates.setdefault(field, list(junk))
+        if spec["kind"] == "thresholds":
+            breaks, _ = build_ladder(spec["ladder"], spec["default"])
+            for bound in breaks:
+                candidates[spec["field"]] += [bound, math.nextafter(bound, -math.inf), math.floor(bound),
+                                              math.ceil(bound), bound + 1, bound - 1]
+        elif spec["kind"] == "lookup":
+            candidates[spec["field"]] += list(spec["table"])
+        elif spec["kind"] == "matches":
+            candidates[spec["field"]].append(spec["value"])
+        elif spec["kind"] == "expr":
+            for field in required | set(optional):
+                candidates[field] += [1, 2, 4, 5.5, 6.0, 7.5, 14999, 15000, 16999, 19000, 21000, 30, 31, 60,
+                                      'Extensive (USA/UK/Schengen)']
+    return candidates
+
+
+def _profiles(rules, seed):
+    rng = random.Random(seed)
+    candidates = _candidates(rules)
+    for _ in range(PROFILES_PER_RULE_SET):
+        profile = {}
+        for field, values in candidates.items():
+            value = rng.choice(values) if rng.random() > 0.05 else _ABSENT
+            if value is not _ABSENT:
+                profile[field] = value
+        yield profile
+
+
+def _outcome(logic, profile):
+    try:
+        return "value", logic(profile)
+    except (KeyError, TypeError):  # the engine skips the rule either way
+        return "skipped", None
+
+
+def _same(a, b):
+    return a == b or (a[0] == b[0] == "value" and a[1] != a[1] and b[1] != b[1])
+
+
+def _summary(result):
+    return (result["total_points"], result["points_per_category"],
+            [rule["id"] for rule in result["mandatory_failures"]], [rule["id"] for rule in result["warning_flags"]])
+
+
+def test_every_rule_has_a_reference():
+    ids = [rule["id"] for rules, _ in RULE_SETS.values() for rule in rules]
+    assert sorted(ids) == sorted(REFERENCE_LOGIC)
+
+
+@pytest.mark.parametrize("name", list(RULE_SETS))
+def test_compiled_rules_match_reference_lambdas(name):
+    rules, evaluator = RULE_SETS[name]
+    reference_rules = [dict(rule, logic=REFERENCE_LOGIC[rule["id"]]) for rule in rules]
+    for profile in _profiles(rules, seed=len(name)):
+        for rule in rules:
+            expected = _outcome(REFERENCE_LOGIC[rule["id"]], profile)
+            actual = _outcome(rule["logic"], profile)
+            if rule["type"] != "points" and expected[0] == actual[0] == "value":
+                expected, actual = ("value", bool(expected[1])), ("value", bool(actual[1]))
+            assert _same(expected, actual), (rule["id"], profile, expected, actual)
+        expected = _summary(evaluate_applicant(profile, reference_rules))
+        assert _summary(evaluate_applicant(profile, rules)) == expected, profile
+        assert _summary(evaluator(profile)) == expected, profile
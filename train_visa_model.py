@@ -1,58 +1,162 @@
 # train_visa_model.py
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report
-import joblib
-from visa_rules_engine import SKILLED_WORKER_RULES, evaluate_applicant # Use the new engine
+from visa_rules_engine import SKILLED_WORKER_RULES, FEATURE_ORDER, model_feature_frame # The exact feature set and order the app scores with
+from visa_batch_engine import evaluate_batch # Vectorized counterpart of evaluate_applicant
+from visa_rule_compiler import rules_fingerprint
+# scikit-learn and joblib are imported where they are used, so importing the feature builders stays cheap
+
+TARGET = 'is_eligible'
+
+
+# --- Stage timing & memory reporting ---
+def largest_process_peak_mb():
+    """
+    Largest peak resident memory of any single process - this one or a finished worker - in MB (None where
+    unsupported). getrusage reports the maximum over children, not their sum, so parallel workers together
+    may have used several times this much.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextmanager
+def stage(name, report):
+    """Times a pipeline stage and records its wall time and the largest single-process peak memory so far."""
+    print(f"{name}...")
+    start = time.perf_counter()
+    yield
+    report.append({"stage": name, "seconds": time.perf_counter() - start, "largest_process_peak_mb": largest_process_peak_mb()})
 
-print("Loading data...")
-df = pd.read_csv("visa_mock_data.csv")
 
-# --- Define the exact feature set and order ---
-FEATURE_ORDER = [
-    'total_points', 'num_mandatory_failures', 'num_warning_flags',
-    'points_age', 'points_education', 'points_language', 'points_work', 'points_bonus'
-]
+def print_report(report):
+    print("\nStage timings:")
+    for row in report:
+        memory = f"{row['largest_process_peak_mb']:.1f} MB" if row['largest_process_peak_mb'] is not None else "n/a"
+        print(f"  {row['stage']:<44} {row['seconds']:>9.3f}s   peak memory (largest process) {memory}")
+
 
 # --- Feature Engineering using the Rule Engine ---
-print("Applying rules engine to generate features...")
-features = []
-for index, row in df.iterrows():
-    applicant_dict = row.to_dict()
-    # Use the new universal evaluator with the correct rule set
-    rule_engine_output = evaluate_applicant(applicant_dict, SKILLED_WORKER_RULES)
-    
-    # Create features from the engine's output
-    features.append({
-        'total_points': rule_engine_output['total_points'],
-        'num_mandatory_failures': len(rule_engine_output['mandatory_failures']),
-        'num_warning_flags': len(rule_engine_output['warning_flags']),
-        'points_age': rule_engine_output['points_per_category'].get('Age', 0),
-        'points_education': rule_engine_output['points_per_category'].get('Education', 0),
-        'points_language': rule_engine_output['points_per_category'].get('Language', 0),
-        'points_work': rule_engine_output['points_per_category'].get('Work Experience', 0),
-        'points_bonus': rule_engine_output['points_per_category'].get('Bonus', 0),
-    })
-
-df_features = pd.DataFrame(features)
-print("Feature generation complete.")
+def build_features(df):
+    """Turns a frame of Skilled Worker applicants into the model's feature matrix."""
+    # Score every applicant at once with the columnar engine (same results as evaluate_applicant per row)
+    return model_feature_frame(evaluate_batch(df, SKILLED_WORKER_RULES))
+
+
+def _build_chunk(chunk):
+    return build_features(chunk), chunk[TARGET]
+
+
+def _parallel_map(fn, items, workers):
+    """Ordered map over a process pool with at most 2 * workers chunks in flight, so memory stays bounded."""
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def generate_features(data_path, chunksize=100_000, workers=None):
+    """Streams the CSV in chunks and builds features across a process pool. Returns (X, y)."""
+    workers = workers or os.cpu_count() or 1
+    chunks = pd.read_csv(data_path, chunksize=chunksize)
+    results = map(_build_chunk, chunks) if workers == 1 else _parallel_map(_build_chunk, chunks, workers)
+    features, targets = zip(*results)
+    return pd.concat(features, ignore_index=True), pd.concat(targets, ignore_index=True)
+
+
+def _cache_key(data_path):
+    stat = os.stat(data_path)
+    return {
+        "data_path": os.path.abspath(data_path), "size": stat.st_size, "mtime": stat.st_mtime,
+        "feature_order": FEATURE_ORDER, "rules": rules_fingerprint(SKILLED_WORKER_RULES),
+    }
+
+
+def load_or_build_features(data_path, cache_path=None, rebuild=False, **kwargs):
+    """
+    Returns (X, y), reusing the engineered feature matrix cached at `cache_path` when it was built
+    from the same data file (size + mtime) with the same features and rule definitions.
+    """
+    import joblib
+    key = _cache_key(data_path)
+    if cache_path and not rebuild and os.path.exists(cache_path):
+        cached = joblib.load(cache_path)
+        if cached.get("key") == key:
+            print(f"Using cached features from {cache_path}")
+            return cached["X"], cached["y"]
+        print("Feature cache is stale; rebuilding.")
+    X, y = generate_features(data_path, **kwargs)
+    if cache_path:
+        joblib.dump({"key": key, "X": X, "y": y}, cache_path)
+    return X, y
+
 
 # --- Model Training ---
-# Enforce the feature order before splitting
-X = df_features[FEATURE_ORDER]
-y = df['is_eligible']
+def train_model(X, y, n_jobs=-1):
+    """Trains the eligibility RandomForest on all cores; returns (model, X_test, y_test)."""
+    from sklearn.model_selection import train_test_split
+    from sklearn.ensemble import RandomForestClassifier
+    # Enforce the feature order before splitting
+    X_train, X_test, y_train, y_test = train_test_split(X[FEATURE_ORDER], y, test_size=0.25, random_state=42, stratify=y)
+    model = RandomForestClassifier(n_estimators=150, random_state=42, class_weight='balanced', max_depth=10, n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+    return model, X_test, y_test
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Retrain the Skilled Worker eligibility model.")
+    parser.add_argument("--data", default="visa_mock_data.csv", help="Applicant CSV with an is_eligible column.")
+    parser.add_argument("--model-out", default="visa_model.joblib")
+    parser.add_argument("--flat-out", default="visa_model_flat", help="Directory for the memory-mappable flat forest export ('' to skip).")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per CSV chunk / feature task.")
+    parser.add_argument("--workers", type=int, default=None, help="Feature-generation processes (default: all cores).")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="RandomForest cores (default: all).")
+    parser.add_argument("--feature-cache", default=None, help="Path to cache the engineered feature matrix.")
+    parser.add_argument("--rebuild-features", action="store_true", help="Ignore an existing feature cache.")
+    args = parser.parse_args(argv)
+    import joblib
+    from sklearn.metrics import classification_report
+    from flat_forest import export_flat_forest
+
+    report = []
+    with stage("Applying rules engine to generate features", report):
+        X, y = load_or_build_features(args.data, args.feature_cache, args.rebuild_features,
+                                      chunksize=args.chunksize, workers=args.workers)
+    print(f"Feature generation complete ({len(X):,} rows).")
+
+    with stage("Training RandomForestClassifier model", report):
+        model, X_test, y_test = train_model(X, y, n_jobs=args.n_jobs)
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=42, stratify=y)
+    # --- Evaluate and Save ---
+    with stage("Evaluating model", report):
+        predictions = model.predict(X_test)
+        print(classification_report(y_test, predictions))
 
-print("Training RandomForestClassifier model...")
-model = RandomForestClassifier(n_estimators=150, random_state=42, class_weight='balanced', max_depth=10)
-model.fit(X_train, y_train)
+    with stage("Saving model", report):
+        joblib.dump(model, args.model_out)
+    print(f"Model retrained with enforced feature order and saved to {args.model_out}")
+    if args.flat_out:
+        with stage("Exporting flat forest", report):
+            export_flat_forest(model, args.flat_out, feature_names=FEATURE_ORDER)
+        print(f"Flat forest exported to {args.flat_out}/ (load with flat_forest.FlatForest.load)")
+    print_report(report)
+    return report
 
-# --- Evaluate and Save ---
-print("Model evaluation:")
-predictions = model.predict(X_test)
-print(classification_report(y_test, predictions))
 
-joblib.dump(model, 'visa_model.joblib')
-print("Model retrained with enforced feature order and saved to visa_model.joblib")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# visa_batch_engine.py
+import numpy as np
+import pandas as pd
+from visa_rule_compiler import build_ladder
+
+
+class _ScalarFallback(Exception):
+    """Raised when a column can't be evaluated exactly as an array (e.g. it holds missing values)."""
+
+
+class _Columns:
+    """Dict-like view over a DataFrame that hands rule kernels whole NumPy columns."""
+
+    def __init__(self, df):
+        self.df = df
+        self.n = len(df)
+
+    def __getitem__(self, key):
+        if key not in self.df.columns:
+            raise KeyError(key)
+        column = self.df[key]
+        if column.isna().any():
+            raise _ScalarFallback(key)
+        return column.to_numpy()
+
+    def get(self, key, default=None):
+        if key not in self.df.columns:
+            return np.full(self.n, default, dtype=object if default is None else None)
+        return self[key]
+
+
+def _truthy(values):
+    """Element-wise Python truthiness, matching what `if value:` does in the scalar engine."""
+    if not isinstance(values, np.ndarray):
+        # Row-by-row results: np.asarray would turn mixed str/bool lists into strings ('False' is truthy)
+        return np.fromiter((bool(v) for v in values), bool, len(values))
+    if values.dtype == bool:
+        return values
+    if values.dtype.kind in "iuf":
+        return values != 0
+    return np.frompyfunc(bool, 1, 1)(values).astype(bool)
+
+
+def _ladder(values, cases, default=0):
+    """Vectorized `a if x == k1 else b if x == k2 else ... else default`."""
+    return np.select([values == key for key in cases], list(cases.values()), default)
+
+
+def _numeric(values):
+    values = np.asarray(values)
+    if values.dtype.kind not in "biuf":
+        # Strings, None, etc. raise TypeError in the scalar comparisons; keep that per row
+        raise _ScalarFallback()
+    return values
+
+
+def _spec_kernel(spec):
+    """Builds a NumPy kernel from a declarative rule spec (see visa_rule_compiler)."""
+    kind = spec["kind"]
+
+    def column(c, field, required):
+        return c[field] if required else c.get(field)
+
+    if kind == "thresholds":
+        breaks, values = build_ladder(spec["ladder"], spec["default"])
+        breaks, values = np.asarray(breaks, dtype=float), np.asarray(values)
+        return lambda c: values[np.searchsorted(breaks, _numeric(column(c, spec["field"], spec["required"])), side="right")]
+    if kind == "lookup":
+        return lambda c: _ladder(column(c, spec["field"], spec["required"]), spec["table"], spec["default"])
+    if kind == "if_true":
+        return lambda c: np.where(_truthy(c.get(spec["field"])), spec["points"], spec["otherwise"])
+    if kind == "truthy":
+        return lambda c: np.logical_or.reduce([_truthy(c.get(field)) for field in spec["fields"]])
+    if kind == "falsy":
+        return lambda c: ~_truthy(c.get(spec["field"]))
+    if kind == "matches":
+        return lambda c: c.get(spec["field"]) == spec["value"]
+    return None
+
+
+# --- Vectorized counterparts of `expr` rules, keyed by rule ID ---
+# Each kernel receives a `_Columns` view and must return exactly what the rule's
+# `logic` would return for every row. Rules without a kernel run row by row.
+VECTOR_LOGIC = {
+    "SW_FAIL_FUNDS": lambda c: c['settlement_funds'] < (15000 + (c.get('family_size', 1) - 1) * 4000),
+    "SW_FAIL_LANG_MIN": lambda c: np.minimum.reduce([c['ielts_speaking'], c['ielts_listening'], c['ielts_reading'], c['ielts_writing']]) < 6.0,
+    "SW_FLAG_FUNDS": lambda c: ((15000 + (c.get('family_size', 1) - 1) * 4000) <= c['settlement_funds'])
+                               & (c['settlement_funds'] < (17000 + (c.get('family_size', 1) - 1) * 4000)),
+    "TR_FLAG_LONG_STAY": lambda c: (_numeric(c.get('trip_duration')) > 30) & (c.get('travel_history') != 'Extensive (USA/UK/Schengen)'),
+}
+
+
+def _kernel_for(rule):
+    spec = rule.get('spec')
+    kernel = _spec_kernel(spec) if spec is not None else None
+    return kernel or VECTOR_LOGIC.get(rule.get('id'))
+
+
+def _evaluate_rule_rowwise(rule, records):
+    """Runs a rule's scalar logic on every row, returning (values, evaluated_mask)."""
+    values, evaluated = [], np.zeros(len(records), dtype=bool)
+    for i, record in enumerate(records):
+        try:
+            values.append(rule['logic'](record))
+            evaluated[i] = True
+        except (KeyError, TypeError):
+            values.append(0)
+    return values, evaluated
+
+
+# --- BATCH EVALUATION ENGINE ---
+def evaluate_batch(df, rules):
+    """
+    Columnar counterpart of `evaluate_applicant` for a whole DataFrame of applicants.
+    Returns the same keys, but as index-aligned pandas objects: `total_points` is a Series,
+    `points_per_category` a DataFrame of category points (0 where no rule scored), and
+    `mandatory_failures` / `warning_flags` boolean DataFrames with one column per rule ID.
+    """
+    columns = _Columns(df)
+    n = len(df)
+    records = None
+
+    total_points = np.zeros(n, dtype=np.int64)
+    points_breakdown = {}
+    mandatory_failures = {}
+    warning_flags = {}
+
+    for rule in rules:
+        kernel = _kernel_for(rule)
+        values = evaluated = None
+        if kernel is not None:
+            try:
+                values = np.broadcast_to(kernel(columns), (n,))
+                evaluated = np.ones(n, dtype=bool)
+            except KeyError:
+                # Missing column: the scalar engine skips this rule for every row
+                values, evaluated = np.zeros(n), np.zeros(n, dtype=bool)
+            except (_ScalarFallback, TypeError):
+                values = None
+        if values is None:
+            # Per-row path keeps the scalar engine's KeyError/TypeError skip semantics exactly
+            if records is None:
+                records = df.to_dict('records')
+            values, evaluated = _evaluate_rule_rowwise(rule, records)
+
+        if rule['type'] == 'points':
+            points = np.where(evaluated, np.asarray(values), 0)
+            category = rule.get('category', 'General')
+            points_breakdown[category] = points_breakdown.get(category, 0) + points
+            total_points = total_points + points
+        elif rule['type'] == 'mandatory_fail':
+            mandatory_failures[rule['id']] = evaluated & _truthy(values)
+        elif rule['type'] == 'flag':
+            warning_flags[rule['id']] = evaluated & _truthy(values)
+
+    # Ensure points don't go below zero from penalties
+    total_points = np.maximum(0, total_points)
+
+    return {
+        "total_points": pd.Series(total_points, index=df.index, name="total_points"),
+        "points_per_category": pd.DataFrame(points_breakdown, index=df.index),
+        "mandatory_failures": pd.DataFrame(mandatory_failures, index=df.index, dtype=bool),
+        "warning_flags": pd.DataFrame(warning_flags, index=df.index, dtype=bool),
+    }
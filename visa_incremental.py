@@ -0,0 +1,233 @@
+# visa_incremental.py
+"""
+Dependency-aware re-evaluation for a single applicant, and vectorized what-if sweeps.
+
+Every declarative rule knows which applicant fields it reads (`spec_fields`). An `Assessment`
+keeps each rule's outcome, so when a few fields change only the rules that read them are re-run
+and the totals, categories, failures, flags and model features are re-assembled from the stored
+outcomes. Evaluations sampled for per-rule metrics (see visa_instrumentation) run every rule through
+`evaluate_instrumented` instead. `what_if` scores a whole range of values for one field, running
+only the rules that read that field (as incremental updates, or with `evaluate_batch` for long sweeps).
+"""
+from visa_instrumentation import SKIPPED as _SKIPPED, instrumentation, evaluate_instrumented
+from visa_rule_compiler import spec_fields
+from visa_rules_engine import FEATURE_ORDER, classify_status, model_features
+
+_MISSING = object()
+
+
+def rule_dependencies(rules):
+    """{rule_id: frozenset of fields it reads}, or None for rules without a spec (they always re-run)."""
+    dependencies = {}
+    for rule in rules:
+        spec = rule.get('spec')
+        if spec is None:
+            dependencies[rule['id']] = None
+        else:
+            required, optional = spec_fields(spec)
+            dependencies[rule['id']] = frozenset(required) | frozenset(optional)
+    return dependencies
+
+
+class Assessment:
+    """One applicant's per-rule outcomes plus the assembled `evaluate_applicant`-style result."""
+
+    def __init__(self, values, outcomes, result, rerun):
+        self.values = values  # the fields the rule set reads, as seen at evaluation time
+        self.outcomes = outcomes  # per rule: its return value or _SKIPPED
+        self.result = result
+        self.rerun = rerun  # IDs of the rules evaluated to produce this assessment
+
+    @property
+    def features(self):
+        """The model's feature vector, in FEATURE_ORDER."""
+        return model_features(self.result)
+
+
+class IncrementalEvaluator:
+    """Produces the same results as `evaluate_applicant(applicant_data, rules)`, re-running only what changed."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.dependencies = [rule_dependencies([rule])[rule['id']] for rule in rules]
+        self.fields = sorted(set().union(*(deps for deps in self.dependencies if deps is not None)))
+        self.by_field = {field: [i for i, deps in enumerate(self.dependencies) if deps is not None and field in deps]
+                         for field in self.fields}
+        self.always = [i for i, deps in enumerate(self.dependencies) if deps is None]
+
+    def evaluate(self, applicant_data):
+        """Full evaluation that records every rule's outcome."""
+        return self._assess(applicant_data, range(len(self.rules)), [None] * len(self.rules))
+
+    def update(self, previous, applicant_data, changed_fields=None):
+        """
+        Re-evaluates `applicant_data` starting from `previous`. `changed_fields` defaults to the fields
+        whose values differ from the ones `previous` was computed with.
+        """
+        if changed_fields is None:
+            changed_fields = [field for field in self.fields
+                              if not _same(previous.values[field], applicant_data.get(field, _MISSING))]
+        indexes = set(self.always)
+        for field in changed_fields:
+            indexes.update(self.by_field.get(field, ()))
+        return self._assess(applicant_data, sorted(indexes), list(previous.outcomes))
+
+    def _assess(self, applicant_data, indexes, outcomes):
+        if instrumentation.enabled and instrumentation.sample(self.rules):
+            # Sampled for per-rule metrics: one full instrumented pass, which also yields every outcome
+            outcomes = []
+            result = evaluate_instrumented(applicant_data, self.rules, outcomes=outcomes)
+            values = {field: applicant_data.get(field, _MISSING) for field in self.fields}
+            return Assessment(values, outcomes, result, [rule['id'] for rule in self.rules])
+        for i in indexes:
+            try:
+                outcomes[i] = self.rules[i]['logic'](applicant_data)
+            except (KeyError, TypeError):
+                outcomes[i] = _SKIPPED
+        values = {field: applicant_data.get(field, _MISSING) for field in self.fields}
+        return Assessment(values, outcomes, self._assemble(outcomes), [self.rules[i]['id'] for i in indexes])
+
+    def _assemble(self, outcomes):
+        """Combines per-rule outcomes in rule order, exactly as `evaluate_applicant` accumulates them."""
+        total_points = 0
+        points_breakdown = {}
+        mandatory_failures = []
+        warning_flags = []
+        for rule, result in zip(self.rules, outcomes):
+            if result is _SKIPPED:
+                continue
+            if rule['type'] == 'points':
+                category = rule.get('category', 'General')
+                points_breakdown[category] = points_breakdown.get(category, 0) + result
+                total_points += result
+            elif rule['type'] == 'mandatory_fail' and result:
+                mandatory_failures.append(rule)
+            elif rule['type'] == 'flag' and result:
+                warning_flags.append(rule)
+        return {
+            "total_points": max(0, total_points),
+            "points_per_category": points_breakdown,
+            "mandatory_failures": mandatory_failures,
+            "warning_flags": warning_flags,
+        }
+
+
+def _same(a, b):
+    if a is b:
+        return True
+    try:
+        return type(a) is type(b) and bool(a == b)
+    except Exception:
+        return False
+
+
+# --- What-if sweeps ---
+# Sweeps up to this many values run as one incremental update per value; below it, building a
+# DataFrame and running `evaluate_batch` costs more than it saves (the app's age sweep is 43 values).
+SCALAR_SWEEP_MAX = 150
+
+
+def what_if(applicant_data, rules, field, values, model=None, evaluator=None):
+    """
+    Scores `applicant_data` with `field` set to each of `values`, re-running only the rules that read
+    `field`: short sweeps as incremental updates, long ones in one vectorized `evaluate_batch` pass.
+    Returns a DataFrame indexed by value with total_points, status, the FEATURE_ORDER columns,
+    one column per points category and, when `model` is given, ml_probability.
+    """
+    import numpy as np
+    import pandas as pd
+    from visa_scoring import predict_probabilities
+
+    evaluator = evaluator or IncrementalEvaluator(rules)
+    values = list(values)
+    if len(values) <= SCALAR_SWEEP_MAX:
+        columns = _sweep_incremental(applicant_data, field, values, evaluator)
+    else:
+        columns = _sweep_vectorized(applicant_data, rules, field, values, evaluator)
+    status = columns.pop('status')
+    # The numeric columns as rows of one array: a DataFrame over those is far cheaper than one from lists
+    names = list(columns)
+    block = np.array([columns[name] for name in names]).reshape(len(names), len(values))
+    numeric = dict(zip(names, block))
+    sweep = pd.DataFrame({'total_points': numeric.pop('total_points'), 'status': status, **numeric},
+                         index=pd.Index(values, name=field), copy=False)
+    if model is not None:
+        rows = block[[names.index(name) for name in FEATURE_ORDER]].T.tolist()
+        sweep['ml_probability'] = predict_probabilities(model, rows) if values else []
+    return sweep
+
+
+def _sweep_incremental(applicant_data, field, values, evaluator):
+    """Sweep columns from one `IncrementalEvaluator.update` per value."""
+    base = evaluator.evaluate(applicant_data)
+    results = [evaluator.update(base, {**applicant_data, field: value}, changed_fields=(field,)).result for value in values]
+    features = [model_features(result) for result in results]
+    columns = {'total_points': [row[0] for row in features],
+               'status': [classify_status(result['total_points'], bool(result['mandatory_failures']))[0] for result in results]}
+    for j, name in enumerate(FEATURE_ORDER[1:], start=1):
+        columns[name] = [row[j] for row in features]
+    categories = dict.fromkeys(category for result in results for category in result['points_per_category'])
+    columns.update({f"category:{category}": [result['points_per_category'].get(category, 0) for result in results]
+                    for category in categories})
+    return columns
+
+
+def _sweep_vectorized(applicant_data, rules, field, values, evaluator):
+    """Sweep columns from the constant rules' outcomes plus one `evaluate_batch` pass over the rules reading `field`."""
+    import numpy as np
+    import pandas as pd
+    from visa_batch_engine import evaluate_batch
+
+    base = evaluator.evaluate(applicant_data)
+    affected = set(evaluator.by_field.get(field, ())) | set(evaluator.always)
+
+    # Constant part: outcomes of the rules that don't read `field`
+    n = len(values)
+    raw_total = np.zeros(n, dtype=np.int64)
+    categories, failures, flags = {}, np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    for i, (rule, result) in enumerate(zip(rules, base.outcomes)):
+        if i in affected or result is _SKIPPED:
+            continue
+        if rule['type'] == 'points':
+            category = rule.get('category', 'General')
+            categories[category] = categories.get(category, 0) + result
+            raw_total += result
+        elif rule['type'] == 'mandatory_fail' and result:
+            failures += 1
+        elif rule['type'] == 'flag' and result:
+            flags += 1
+
+    # Varying part: one row per value, carrying the other fields the affected rules read
+    affected_rules = [rules[i] for i in sorted(affected)]
+    if affected_rules:
+        read = set(evaluator.fields if evaluator.always else
+                   set().union(*(evaluator.dependencies[i] for i in affected))) | {field}
+        frame = pd.DataFrame({f: [applicant_data[f]] * n for f in read if f != field and f in applicant_data})
+        # pandas would turn None among numbers into NaN, which compares differently from None
+        frame[field] = pd.Series(values, dtype=object if any(value is None for value in values) else None)
+        if evaluator.always:
+            # Rules without a spec may read anything; give them the full profile
+            for f, value in applicant_data.items():
+                if f not in frame.columns:
+                    frame[f] = [value] * n
+        batch = evaluate_batch(frame, affected_rules)
+        for category, points in batch['points_per_category'].items():
+            categories[category] = categories.get(category, 0) + points.to_numpy()
+            raw_total += points.to_numpy()
+        failures += batch['mandatory_failures'].sum(axis=1).to_numpy(dtype=np.int64)
+        flags += batch['warning_flags'].sum(axis=1).to_numpy(dtype=np.int64)
+
+    total_points = np.maximum(0, raw_total)
+    columns = {
+        'total_points': total_points,
+        'status': [classify_status(points, failed > 0)[0] for points, failed in zip(total_points, failures)],
+        'num_mandatory_failures': failures,
+        'num_warning_flags': flags,
+        'points_age': np.broadcast_to(categories.get('Age', 0), (n,)),
+        'points_education': np.broadcast_to(categories.get('Education', 0), (n,)),
+        'points_language': np.broadcast_to(categories.get('Language', 0), (n,)),
+        'points_work': np.broadcast_to(categories.get('Work Experience', 0), (n,)),
+        'points_bonus': np.broadcast_to(categories.get('Bonus', 0), (n,)),
+    }
+    columns.update({f"category:{category}": np.broadcast_to(points, (n,)) for category, points in categories.items()})
+    return columns
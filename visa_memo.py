@@ -0,0 +1,97 @@
+# visa_memo.py
+import threading
+from collections import OrderedDict
+
+from visa_rules_engine import evaluate_applicant
+
+
+def freeze(value):
+    """Canonical, hashable form of applicant data: dicts become sorted item tuples, numpy scalars plain Python."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    if hasattr(value, 'item') and callable(value.item):  # numpy scalar
+        return value.item()
+    return value
+
+
+def rule_set_fingerprint(rules):
+    """
+    Identity of a rule set that changes when the list, any rule, or any rule's logic/spec is swapped.
+    The logic callables are part of the key itself; specs (unhashable dicts) are keyed by id, so callers
+    must keep `rule_set_specs(rules)` alive alongside the key to stop those ids being reused.
+    """
+    return (id(rules),) + tuple((rule.get('id'), rule.get('logic'), id(rule.get('spec'))) for rule in rules)
+
+
+def rule_set_specs(rules):
+    return [rule.get('spec') for rule in rules]
+
+
+class AssessmentMemo:
+    """
+    Bounded LRU cache of (rule-engine result, ML probability) per applicant profile and rule set.
+    Swapping in a different (non-None) model object clears the cache. Cached results are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = self.misses = self.invalidations = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._model = None
+
+    def assess(self, applicant_data, rules, model=None, predict_fn=None, evaluate=None):
+        """
+        Returns (rule_output, probability). `evaluate(applicant_data)` defaults to
+        `evaluate_applicant(applicant_data, rules)`; `predict_fn(model, rule_output)` is only called
+        when both it and `model` are given, otherwise probability is None.
+        """
+        try:
+            key = (rule_set_fingerprint(rules), predict_fn is not None and model is not None, freeze(applicant_data))
+            specs = rule_set_specs(rules)  # taken with the key, before any concurrent swap
+            hash(key)
+        except TypeError:  # an unhashable value we can't canonicalize; just compute
+            return self._compute(applicant_data, rules, model, predict_fn, evaluate)
+
+        with self._lock:
+            if model is not None and model is not self._model:
+                if self._model is not None:
+                    # A retrained/reloaded model makes every cached probability stale
+                    self.invalidations += 1
+                    self._entries.clear()
+                self._model = model
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2], entry[3]
+            self.misses += 1
+
+        rule_output, probability = self._compute(applicant_data, rules, model, predict_fn, evaluate)
+        with self._lock:
+            if model is None or model is self._model:
+                # The rules list and specs the key refers to by id are kept alive with the entry, so those
+                # ids can't be reused by another rule set or a swapped-in spec
+                self._entries[key] = (rules, specs, rule_output, probability)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return rule_output, probability
+
+    def _compute(self, applicant_data, rules, model, predict_fn, evaluate):
+        rule_output = evaluate(applicant_data) if evaluate is not None else evaluate_applicant(applicant_data, rules)
+        probability = predict_fn(model, rule_output) if predict_fn is not None and model is not None else None
+        return rule_output, probability
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "invalidations": self.invalidations,
+                    "size": len(self._entries), "maxsize": self.maxsize,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,110 @@
+# visa_resources.py
+import os
+import threading
+import time
+
+
+class ResourceCache:
+    """
+    Process-wide registry of expensive objects (models, API clients, caches). Each resource is built
+    once and shared by every caller in the process - Streamlit reruns and sessions included, since
+    imported modules survive reruns. File-backed resources are rebuilt when the file's mtime changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # guards _entries / _load_locks; never held while loading
+        self._entries = {}
+        self._load_locks = {}
+
+    def _fresh(self, name, mtime):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry["mtime"] == mtime:
+                entry["hits"] += 1
+                return entry
+            return None
+
+    def get(self, name, loader, path=None):
+        """
+        Returns the cached resource `name`, calling `loader()` on first use or when `path` was modified.
+        Loads run under a per-resource lock, so a slow load only holds up callers of that same resource.
+        """
+        mtime = os.path.getmtime(path) if path is not None else None
+        entry = self._fresh(name, mtime)
+        if entry is not None:
+            return entry["value"]
+        with self._lock:
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            entry = self._fresh(name, mtime)  # another caller may have loaded it while we waited
+            if entry is not None:
+                return entry["value"]
+            start = time.perf_counter()
+            value = loader()
+            load_seconds = time.perf_counter() - start
+            with self._lock:
+                previous = self._entries.get(name)
+                self._entries[name] = {
+                    "value": value, "mtime": mtime, "hits": previous["hits"] if previous else 0,
+                    "loads": previous["loads"] + 1 if previous else 1,
+                    "load_seconds": load_seconds, "loaded_at": time.time(),
+                }
+            return value
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self):
+        """{name: {"loads", "hits", "load_seconds", "loaded_at"}} for every resource loaded so far."""
+        with self._lock:
+            return {name: {k: v for k, v in entry.items() if k not in ("value", "mtime")} for name, entry in self._entries.items()}
+
+
+resources = ResourceCache()
+
+
+# --- Shared resources ---
+def get_model(path="visa_model.joblib"):
+    """The Skilled Worker RandomForest, unpickled once per process and reloaded when the file changes."""
+    import joblib
+    return resources.get(f"model:{os.path.abspath(path)}", lambda: joblib.load(path), path=path)
+
+
+def get_flat_model(path="visa_model_flat"):
+    """The flat-array export of the model (see flat_forest), memory-mapped once and reloaded on re-export."""
+    from flat_forest import FlatForest
+    return resources.get(f"flat_model:{os.path.abspath(path)}", lambda: FlatForest.load(path), path=os.path.join(path, "meta.json"))
+
+
+def get_scoring_model(flat_path="visa_model_flat", joblib_path="visa_model.joblib", batched=False):
+    """`visa_scoring.load_model`, shared process-wide and reloaded when the file it came from changes (None if no model)."""
+    from visa_scoring import load_model
+    meta = os.path.join(flat_path, "meta.json") if flat_path else None
+    source = meta if meta and os.path.exists(meta) else joblib_path if joblib_path and os.path.exists(joblib_path) else None
+    key = f"scoring_model:{os.path.abspath(source) if source else None}:{'batched' if batched else 'rows'}"
+    return resources.get(key, lambda: load_model(flat_path, joblib_path, batched), path=source)
+
+
+def get_score_table(name, directory="score_tables"):
+    """Precomputed Student/Tourist results (see score_table), built and saved on first use if missing."""
+    from score_table import load_or_build
+    return resources.get(f"score_table:{name}", lambda: load_or_build(name, directory))
+
+
+def get_gemini_model(api_key, model_name="gemini-1.5-flash"):
+    """A configured Gemini client, created once per process for each API key / model name."""
+    def load():
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name)
+    return resources.get(f"gemini:{model_name}:{hash(api_key)}", load)
+
+
+def get_analysis_cache(path=".gemini_cache.sqlite3"):
+    """The persistent Gemini response cache (see gemini_analysis.AnalysisCache)."""
+    from gemini_analysis import AnalysisCache
+    return resources.get(f"analysis_cache:{path}", lambda: AnalysisCache(path))
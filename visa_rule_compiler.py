@@ -0,0 +1,275 @@
+# visa_rule_compiler.py
+import hashlib
+import json
+import math
+
+from visa_instrumentation import instrumentation, evaluate_instrumented
+
+_INF = math.inf
+
+
+# --- A. DECLARATIVE RULE FORMAT ---
+# Conditions used in threshold ladders. Each one is a half-open numeric interval [lo, hi);
+# inclusive upper bounds are nudged with math.nextafter so `x <= hi` stays exact for any float.
+def at_least(threshold):
+    return (threshold, _INF)
+
+def between(low, high):
+    """low <= x <= high"""
+    return (low, math.nextafter(high, _INF))
+
+def in_range(low, high):
+    """low <= x < high"""
+    return (low, high)
+
+def equals(value):
+    return (value, math.nextafter(value, _INF))
+
+
+def thresholds(field, ladder, default=0, required=True):
+    """
+    Numeric ladder of (condition, points) pairs. The first matching condition wins, exactly like a
+    chained `a if cond1 else b if cond2 else ... else default` lambda.
+    """
+    return {"kind": "thresholds", "field": field, "ladder": list(ladder), "default": default, "required": required}
+
+def lookup(field, table, default=0, required=False):
+    """Categorical map from field value to points; values not in the table score `default`."""
+    return {"kind": "lookup", "field": field, "table": dict(table), "default": default, "required": required}
+
+def if_true(field, points, otherwise=0):
+    """`points if d.get(field) else otherwise`"""
+    return {"kind": "if_true", "field": field, "points": points, "otherwise": otherwise}
+
+def truthy(*fields):
+    """Boolean predicate: true if any of the fields is truthy (a single field reads as `d.get(field)`)."""
+    return {"kind": "truthy", "fields": list(fields)}
+
+def falsy(field):
+    """Boolean predicate: `not d.get(field)`"""
+    return {"kind": "falsy", "field": field}
+
+def matches(field, value):
+    """Boolean predicate: `d.get(field) == value`"""
+    return {"kind": "matches", "field": field, "value": value}
+
+def expr(fn, required=(), optional=None):
+    """
+    Escape hatch for logic that doesn't fit the declarative kinds. `fn` receives each field as a
+    keyword argument; `required` fields behave like `d[field]`, `optional` ones like `d.get(field, default)`.
+    """
+    return {"kind": "expr", "fn": fn, "required": list(required), "optional": dict(optional or {})}
+
+
+# --- B. COMPILER ---
+def build_ladder(ladder, default):
+    """Flattens a first-match-wins ladder into sorted breakpoints and one value per segment."""
+    breaks = sorted({bound for interval, _ in ladder for bound in interval if math.isfinite(bound)})
+    starts = [-_INF] + breaks
+    values = []
+    for start in starts:
+        value = default
+        for (low, high), points in ladder:
+            if low <= start < high:
+                value = points
+                break
+        values.append(value)
+    return breaks, values
+
+
+def spec_fields(spec):
+    """Returns ({required fields}, {optional field: default}) for a rule spec."""
+    kind = spec["kind"]
+    if kind == "expr":
+        return set(spec["required"]), dict(spec["optional"])
+    if kind == "truthy":
+        return set(), {field: None for field in spec["fields"]}
+    if spec.get("required"):
+        return {spec["field"]}, {}
+    return set(), {spec["field"]: None}
+
+
+def rules_fingerprint(rules):
+    """
+    Hash of rule IDs, types, categories and spec contents (including `expr` bytecode), so caches keyed
+    on it go stale when a threshold or table changes. Rules without a spec are hashed by their `logic`.
+    """
+    def encode(value):
+        if callable(value):
+            code = value.__code__
+            return [code.co_code.hex(), repr(code.co_consts), list(code.co_names)]
+        raise TypeError(value)
+    payload = [[r['id'], r['type'], r.get('category'), r['spec'] if 'spec' in r else r.get('logic')] for r in rules]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=encode).encode()).hexdigest()
+
+
+# Declarative rules are compiled to generated source with their constants inlined, so each `logic`
+# is the same shape as the hand-written lambda it replaces (`10 if d.get('has_job_offer') else 0`).
+def _literal(value, namespace):
+    """Source for a constant: inlined if it's a plain literal, otherwise bound as a global of the generated code."""
+    if type(value) in (int, str, bool, type(None)) or (type(value) is float and math.isfinite(value)):
+        return repr(value)
+    name = f"_k{len(namespace)}"
+    namespace[name] = value
+    return name
+
+
+def _generate(source, namespace):
+    """Compiles `def logic(d): ...` source with `namespace` as its globals."""
+    exec(source, namespace)
+    return namespace["logic"]
+
+
+def _read(field, required):
+    return f"d[{field!r}]" if required else f"d.get({field!r})"
+
+
+def _compile_thresholds(spec):
+    """
+    Binary search over the flattened ladder with inlined comparisons (`x >= 36` ...), i.e. bisect
+    without the call. Like the chained comparisons it replaces, it raises KeyError for a missing
+    required field and TypeError for None / strings.
+    """
+    default = spec["default"]
+    breaks, values = build_ladder(spec["ladder"], default)
+    # Adjacent segments worth the same points need no comparison between them
+    merged_breaks, merged_values = [], values[:1]
+    for bound, value in zip(breaks, values[1:]):
+        if value != merged_values[-1]:
+            merged_breaks.append(bound)
+            merged_values.append(value)
+    namespace = {}
+
+    def search(lo, hi):
+        if lo == hi:
+            return _literal(merged_values[lo], namespace)
+        mid = (lo + hi + 1) // 2
+        return f"({search(mid, hi)} if x >= {_literal(merged_breaks[mid - 1], namespace)} else {search(lo, mid - 1)})"
+
+    lines = ["def logic(d):", f"    x = {_read(spec['field'], spec['required'])}"]
+    if merged_values[0] != default:
+        # NaN fails every comparison in the original ladders, but would land in the first segment here
+        lines.append(f"    if x != x: return {_literal(default, namespace)}")
+    lines.append(f"    return {search(0, len(merged_values) - 1)}")
+    return _generate("\n".join(lines), namespace)
+
+
+def _compile_lookup(spec):
+    """A dict lookup; unhashable values never equal a table key, so they score the default."""
+    namespace = {"table": spec["table"]}
+    default = _literal(spec["default"], namespace)
+    return _generate(f"def logic(d):\n"
+                     f"    try:\n"
+                     f"        return table.get({_read(spec['field'], spec['required'])}, {default})\n"
+                     f"    except TypeError:\n"
+                     f"        return {default}", namespace)
+
+
+def _compile_expr(spec):
+    """Calls `fn` with its arguments read straight from the applicant dict (positionally when it's a plain function)."""
+    fn, optional = spec["fn"], spec["optional"]
+    namespace = {"fn": fn}
+    fields = [*spec["required"], *optional]
+    code = getattr(fn, "__code__", None)
+    positional = (code is not None and not code.co_flags & 0x0C and not code.co_kwonlyargcount
+                  and sorted(code.co_varnames[:code.co_argcount]) == sorted(fields))  # 0x0C: *args / **kwargs
+    arguments = []
+    for field in code.co_varnames[:code.co_argcount] if positional else fields:
+        read = f"d.get({field!r}, {_literal(optional[field], namespace)})" if field in optional else f"d[{field!r}]"
+        arguments.append(read if positional else f"{field}={read}")
+    if not positional and not all(field.isidentifier() for field in fields):
+        raise ValueError(f"expr fields must be valid argument names: {fields}")
+    return _generate(f"def logic(d):\n    return fn({', '.join(arguments)})", namespace)
+
+
+def compile_logic(spec):
+    """
+    Compiles a single spec into a `logic(applicant_data)` callable with the same semantics as a rule
+    lambda: required fields are read as `d[field]` (KeyError when absent), optional ones as `d.get(field)`.
+    """
+    kind = spec["kind"]
+    namespace = {}
+    if kind == "thresholds":
+        return _compile_thresholds(spec)
+    if kind == "lookup":
+        return _compile_lookup(spec)
+    if kind == "expr":
+        return _compile_expr(spec)
+    if kind == "if_true":
+        body = (f"{_literal(spec['points'], namespace)} if d.get({spec['field']!r}) "
+                f"else {_literal(spec['otherwise'], namespace)}")
+    elif kind == "truthy":
+        body = " or ".join(f"d.get({field!r})" for field in spec["fields"])
+    elif kind == "falsy":
+        body = f"not d.get({spec['field']!r})"
+    elif kind == "matches":
+        body = f"d.get({spec['field']!r}) == {_literal(spec['value'], namespace)}"
+    else:
+        raise ValueError(f"Unknown rule spec kind: {kind!r}")
+    return _generate(f"def logic(d):\n    return {body}", namespace)
+
+
+def compile_rules(rules):
+    """
+    Compiles a rule set into a single evaluator with the same output as `evaluate_applicant`.
+    Declarative rules run as their compiled `logic` (inlined threshold searches, dict lookups),
+    rules without a `spec` use their own lambda, and rule types are resolved here instead of per call.
+    """
+    points_rules, failure_rules, flag_rules = [], [], []
+    for rule in rules:
+        spec = rule.get("spec")
+        logic = rule['logic'] if spec is None else compile_logic(spec)
+        if rule['type'] == 'points':
+            points_rules.append((logic, rule.get('category', 'General')))
+        elif rule['type'] == 'mandatory_fail':
+            failure_rules.append((logic, rule))
+        elif rule['type'] == 'flag':
+            flag_rules.append((logic, rule))
+
+    def evaluate(applicant_data):
+        if instrumentation.enabled and instrumentation.sample(rules):
+            return evaluate_instrumented(applicant_data, rules)
+
+        total_points = 0
+        points_breakdown = {}
+        mandatory_failures = []
+        warning_flags = []
+
+        for logic, category in points_rules:
+            try:
+                result = logic(applicant_data)
+            except (KeyError, TypeError):
+                continue
+            points_breakdown[category] = points_breakdown.get(category, 0) + result
+            total_points += result
+
+        for logic, rule in failure_rules:
+            try:
+                if logic(applicant_data):
+                    mandatory_failures.append(rule)
+            except (KeyError, TypeError):
+                continue
+
+        for logic, rule in flag_rules:
+            try:
+                if logic(applicant_data):
+                    warning_flags.append(rule)
+            except (KeyError, TypeError):
+                continue
+
+        return {
+            "total_points": max(0, total_points),
+            "points_per_category": points_breakdown,
+            "mandatory_failures": mandatory_failures,
+            "warning_flags": warning_flags,
+        }
+
+    return evaluate
+
+
+def with_compiled_logic(rules):
+    """Fills in each declarative rule's `logic` from its spec, so the generic engine can run it too."""
+    for rule in rules:
+        if "spec" in rule:
+            rule["logic"] = compile_logic(rule["spec"])
+    return rules
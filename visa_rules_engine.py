@@ -1,84 +1,99 @@
 # visa_rules_engine.py
+from visa_rule_compiler import (
+    thresholds, lookup, if_true, truthy, falsy, matches, expr,
+    at_least, between, in_range, equals,
+    compile_rules, with_compiled_logic,
+)
+from visa_instrumentation import instrumentation, evaluate_instrumented
 
 # --- A. SKILLED WORKER VISA RULES (Comprehensive Points System) ---
 SKILLED_WORKER_RULES = [
     # 1. Core Human Capital (Max 67)
-    {"id": "SW_AGE", "category": "Age", "type": "points", "logic": lambda d: 12 if 18<=d['age']<=35 else 11 if d['age']==36 else 10 if d['age']==37 else 9 if d['age']==38 else 8 if d['age']==39 else 7 if d['age']==40 else 6 if d['age']==41 else 5 if d['age']==42 else 4 if d['age']==43 else 3 if d['age']==44 else 2 if d['age']==45 else 1 if d['age']==46 else 0},
-    {"id": "SW_EDU", "category": "Education", "type": "points", "logic": lambda d: 25 if d['education_level']=='PhD' else 23 if d['education_level']=='Masters' else 22 if d['education_level']=='DualDegree' else 21 if d['education_level']=='Bachelors' else 19 if d['education_level']=='Diploma' else 5},
-    {"id": "SW_WORK", "category": "Work Experience", "type": "points", "logic": lambda d: 15 if d['work_experience_years']>=6 else 13 if 4<=d['work_experience_years']<6 else 11 if 2<=d['work_experience_years']<4 else 9 if d['work_experience_years']==1 else 0},
-    {"id": "SW_LANG_L", "category": "Language", "type": "points", "logic": lambda d: 6 if d['ielts_listening']>=8.0 else 5 if d['ielts_listening']>=7.5 else 4 if d['ielts_listening']>=6.0 else 0},
-    {"id": "SW_LANG_S", "category": "Language", "type": "points", "logic": lambda d: 6 if d['ielts_speaking']>=7.0 else 5 if d['ielts_speaking']>=6.5 else 4 if d['ielts_speaking']>=6.0 else 0},
-    {"id": "SW_LANG_R", "category": "Language", "type": "points", "logic": lambda d: 6 if d['ielts_reading']>=7.0 else 5 if d['ielts_reading']>=6.5 else 4 if d['ielts_reading']>=6.0 else 0},
-    {"id": "SW_LANG_W", "category": "Language", "type": "points", "logic": lambda d: 6 if d['ielts_writing']>=7.0 else 5 if d['ielts_writing']>=6.5 else 4 if d['ielts_writing']>=6.0 else 0},
+    {"id": "SW_AGE", "category": "Age", "type": "points", "spec": thresholds('age', [(between(18, 35), 12)] + [(equals(age), 47 - age) for age in range(36, 47)])},
+    {"id": "SW_EDU", "category": "Education", "type": "points", "spec": lookup('education_level', {'PhD': 25, 'Masters': 23, 'DualDegree': 22, 'Bachelors': 21, 'Diploma': 19}, default=5, required=True)},
+    {"id": "SW_WORK", "category": "Work Experience", "type": "points", "spec": thresholds('work_experience_years', [(at_least(6), 15), (in_range(4, 6), 13), (in_range(2, 4), 11), (equals(1), 9)])},
+    {"id": "SW_LANG_L", "category": "Language", "type": "points", "spec": thresholds('ielts_listening', [(at_least(8.0), 6), (at_least(7.5), 5), (at_least(6.0), 4)])},
+    {"id": "SW_LANG_S", "category": "Language", "type": "points", "spec": thresholds('ielts_speaking', [(at_least(7.0), 6), (at_least(6.5), 5), (at_least(6.0), 4)])},
+    {"id": "SW_LANG_R", "category": "Language", "type": "points", "spec": thresholds('ielts_reading', [(at_least(7.0), 6), (at_least(6.5), 5), (at_least(6.0), 4)])},
+    {"id": "SW_LANG_W", "category": "Language", "type": "points", "spec": thresholds('ielts_writing', [(at_least(7.0), 6), (at_least(6.5), 5), (at_least(6.0), 4)])},
     
     # 2. Adaptability & Bonus Factors (Max 33)
-    {"id": "SW_JOB_OFFER", "category": "Bonus", "type": "points", "logic": lambda d: 10 if d.get('has_job_offer') else 0},
-    {"id": "SW_DEMAND", "category": "Bonus", "type": "points", "logic": lambda d: 8 if d.get('occupation_demand_level')=='Critical' else 5 if d.get('occupation_demand_level')=='High' else 0},
-    {"id": "SW_LOCAL_WORK", "category": "Bonus", "type": "points", "logic": lambda d: 5 if d.get('has_local_work_experience') else 0},
-    {"id": "SW_RELATIVE", "category": "Bonus", "type": "points", "logic": lambda d: 5 if d.get('has_relative') else 0},
-    {"id": "SW_TRAVEL_HIST", "category": "Bonus", "type": "points", "logic": lambda d: 5 if d.get('has_positive_travel_history') else 0},
+    {"id": "SW_JOB_OFFER", "category": "Bonus", "type": "points", "spec": if_true('has_job_offer', 10)},
+    {"id": "SW_DEMAND", "category": "Bonus", "type": "points", "spec": lookup('occupation_demand_level', {'Critical': 8, 'High': 5})},
+    {"id": "SW_LOCAL_WORK", "category": "Bonus", "type": "points", "spec": if_true('has_local_work_experience', 5)},
+    {"id": "SW_RELATIVE", "category": "Bonus", "type": "points", "spec": if_true('has_relative', 5)},
+    {"id": "SW_TRAVEL_HIST", "category": "Bonus", "type": "points", "spec": if_true('has_positive_travel_history', 5)},
 
     # 3. Mandatory Failures & Flags
-    {"id": "SW_FAIL_FUNDS", "type": "mandatory_fail", "description": "Settlement funds below minimum for family size.", "logic": lambda d: d['settlement_funds'] < (15000 + (d.get('family_size', 1) - 1) * 4000)},
-    {"id": "SW_FAIL_CRIMINAL", "type": "mandatory_fail", "description": "Applicant has a disqualifying criminal record.", "logic": lambda d: d.get('has_criminal_record')},
-    {"id": "SW_FAIL_LANG_MIN", "type": "mandatory_fail", "description": "Minimum language score (IELTS 6.0 in all bands) not met.", "logic": lambda d: min(d['ielts_speaking'], d['ielts_listening'], d['ielts_reading'], d['ielts_writing']) < 6.0},
-    {"id": "SW_FLAG_FUNDS", "type": "flag", "description": "Funds are very close to the minimum required level.", "logic": lambda d: (15000+(d.get('family_size',1)-1)*4000) <= d['settlement_funds'] < (17000+(d.get('family_size',1)-1)*4000)},
-    {"id": "SW_FLAG_REFUSAL", "type": "flag", "description": "Previous visa refusal needs to be strongly addressed.", "logic": lambda d: d.get('has_previous_refusal')},
+    {"id": "SW_FAIL_FUNDS", "type": "mandatory_fail", "description": "Settlement funds below minimum for family size.", "spec": expr(lambda settlement_funds, family_size: settlement_funds < (15000 + (family_size - 1) * 4000), required=['settlement_funds'], optional={'family_size': 1})},
+    {"id": "SW_FAIL_CRIMINAL", "type": "mandatory_fail", "description": "Applicant has a disqualifying criminal record.", "spec": truthy('has_criminal_record')},
+    {"id": "SW_FAIL_LANG_MIN", "type": "mandatory_fail", "description": "Minimum language score (IELTS 6.0 in all bands) not met.", "spec": expr(lambda ielts_speaking, ielts_listening, ielts_reading, ielts_writing: min(ielts_speaking, ielts_listening, ielts_reading, ielts_writing) < 6.0, required=['ielts_speaking', 'ielts_listening', 'ielts_reading', 'ielts_writing'])},
+    {"id": "SW_FLAG_FUNDS", "type": "flag", "description": "Funds are very close to the minimum required level.", "spec": expr(lambda settlement_funds, family_size: (15000+(family_size-1)*4000) <= settlement_funds < (17000+(family_size-1)*4000), required=['settlement_funds'], optional={'family_size': 1})},
+    {"id": "SW_FLAG_REFUSAL", "type": "flag", "description": "Previous visa refusal needs to be strongly addressed.", "spec": truthy('has_previous_refusal')},
 ]
 
 # --- B. STUDENT VISA RULES (New 100-Point System) ---
 STUDENT_VISA_RULES = [
     # 1. Academic Profile (Max 30)
-    {"id": "ST_LOA", "category": "Academics", "type": "points", "logic": lambda d: 20 if d.get('has_loa') else -100}, # Effectively a fail
-    {"id": "ST_GPA", "category": "Academics", "type": "points", "logic": lambda d: 10 if d.get('gpa') == '> 3.5' else 7 if d.get('gpa') == '3.0 - 3.5' else 4 if d.get('gpa') == '2.5 - 3.0' else 0},
+    {"id": "ST_LOA", "category": "Academics", "type": "points", "spec": if_true('has_loa', 20, otherwise=-100)}, # Effectively a fail
+    {"id": "ST_GPA", "category": "Academics", "type": "points", "spec": lookup('gpa', {'> 3.5': 10, '3.0 - 3.5': 7, '2.5 - 3.0': 4})},
 
     # 2. Financial Capacity (Max 30)
-    {"id": "ST_FIN_COVERAGE", "category": "Financials", "type": "points", "logic": lambda d: 30 if d.get('financial_coverage') == '> 150%' else 20 if d.get('financial_coverage') == '100% - 150%' else 5 if d.get('financial_coverage') == '100% (Minimum)' else -100},
+    {"id": "ST_FIN_COVERAGE", "category": "Financials", "type": "points", "spec": lookup('financial_coverage', {'> 150%': 30, '100% - 150%': 20, '100% (Minimum)': 5}, default=-100)},
     
     # 3. Language Proficiency (Max 15)
-    {"id": "ST_LANG_SCORE", "category": "Language", "type": "points", "logic": lambda d: 15 if d.get('language_test_score') == 'High (IELTS 7+)' else 10 if d.get('language_test_score') == 'Good (IELTS 6.5)' else 5 if d.get('language_test_score') == 'Adequate (IELTS 6.0)' else 0},
+    {"id": "ST_LANG_SCORE", "category": "Language", "type": "points", "spec": lookup('language_test_score', {'High (IELTS 7+)': 15, 'Good (IELTS 6.5)': 10, 'Adequate (IELTS 6.0)': 5})},
     
     # 4. Non-Immigrant Intent / Ties to Home Country (Max 25)
-    {"id": "ST_TIES_FAMILY", "category": "Home Ties", "type": "points", "logic": lambda d: 10 if d.get('family_ties') == 'Immediate family' else 5 if d.get('family_ties') == 'Extended family' else 0},
-    {"id": "ST_TIES_PROPERTY", "category": "Home Ties", "type": "points", "logic": lambda d: 10 if d.get('has_property') else 0},
-    {"id": "ST_TIES_JOB", "category": "Home Ties", "type": "points", "logic": lambda d: 5 if d.get('has_job_prospects') else 0},
+    {"id": "ST_TIES_FAMILY", "category": "Home Ties", "type": "points", "spec": lookup('family_ties', {'Immediate family': 10, 'Extended family': 5})},
+    {"id": "ST_TIES_PROPERTY", "category": "Home Ties", "type": "points", "spec": if_true('has_property', 10)},
+    {"id": "ST_TIES_JOB", "category": "Home Ties", "type": "points", "spec": if_true('has_job_prospects', 5)},
 
     # 5. Mandatory Failures & Flags
-    {"id": "ST_FAIL_MISREP", "type": "mandatory_fail", "description": "History of visa misrepresentation.", "logic": lambda d: d.get('has_misrepresentation')},
-    {"id": "ST_FLAG_STUDY_GAP", "type": "flag", "description": "A long study gap requires a clear explanation.", "logic": lambda d: d.get('study_gap') == '> 3 years'},
-    {"id": "ST_FLAG_REFUSAL", "type": "flag", "description": "Previous visa refusal raises concerns.", "logic": lambda d: d.get('has_previous_refusal')},
-    {"id": "ST_FLAG_COURSE_RELEVANCE", "type": "flag", "description": "Chosen course is not clearly relevant to past studies/career.", "logic": lambda d: not d.get('is_course_relevant')},
+    {"id": "ST_FAIL_MISREP", "type": "mandatory_fail", "description": "History of visa misrepresentation.", "spec": truthy('has_misrepresentation')},
+    {"id": "ST_FLAG_STUDY_GAP", "type": "flag", "description": "A long study gap requires a clear explanation.", "spec": matches('study_gap', '> 3 years')},
+    {"id": "ST_FLAG_REFUSAL", "type": "flag", "description": "Previous visa refusal raises concerns.", "spec": truthy('has_previous_refusal')},
+    {"id": "ST_FLAG_COURSE_RELEVANCE", "type": "flag", "description": "Chosen course is not clearly relevant to past studies/career.", "spec": falsy('is_course_relevant')},
 ]
 
 # --- C. TOURIST VISA RULES (New 100-Point System) ---
 TOURIST_VISA_RULES = [
     # 1. Financial Capacity (Max 30)
-    {"id": "TR_FUNDS", "category": "Financials", "type": "points", "logic": lambda d: 30 if d.get('funds_per_day') == '> $300' else 20 if d.get('funds_per_day') == '$200 - $300' else 10 if d.get('funds_per_day') == '$100 - $200' else -100},
+    {"id": "TR_FUNDS", "category": "Financials", "type": "points", "spec": lookup('funds_per_day', {'> $300': 30, '$200 - $300': 20, '$100 - $200': 10}, default=-100)},
 
     # 2. Purpose of Visit (Max 25)
-    {"id": "TR_PURPOSE", "category": "Purpose", "type": "points", "logic": lambda d: 25 if d.get('purpose') == 'Visiting Family (with invitation)' else 20 if d.get('purpose') == 'Tourism (detailed itinerary)' else 10 if d.get('purpose') == 'Tourism (basic plan)' else 5},
+    {"id": "TR_PURPOSE", "category": "Purpose", "type": "points", "spec": lookup('purpose', {'Visiting Family (with invitation)': 25, 'Tourism (detailed itinerary)': 20, 'Tourism (basic plan)': 10}, default=5)},
     
     # 3. Ties to Home Country (Max 35)
-    {"id": "TR_TIES_EMPLOYMENT", "category": "Home Ties", "type": "points", "logic": lambda d: 15 if d.get('employment_status') == 'Stable full-time job' else 5 if d.get('employment_status') == 'Part-time / Self-employed' else 0},
-    {"id": "TR_TIES_FAMILY", "category": "Home Ties", "type": "points", "logic": lambda d: 10 if d.get('family_ties') == 'Spouse and/or children' else 5 if d.get('family_ties') == 'Parents / Siblings' else 0},
-    {"id": "TR_TIES_PROPERTY", "category": "Home Ties", "type": "points", "logic": lambda d: 10 if d.get('has_property') else 0},
+    {"id": "TR_TIES_EMPLOYMENT", "category": "Home Ties", "type": "points", "spec": lookup('employment_status', {'Stable full-time job': 15, 'Part-time / Self-employed': 5})},
+    {"id": "TR_TIES_FAMILY", "category": "Home Ties", "type": "points", "spec": lookup('family_ties', {'Spouse and/or children': 10, 'Parents / Siblings': 5})},
+    {"id": "TR_TIES_PROPERTY", "category": "Home Ties", "type": "points", "spec": if_true('has_property', 10)},
 
     # 4. Personal History (Max 10)
-    {"id": "TR_TRAVEL_HISTORY", "category": "History", "type": "points", "logic": lambda d: 10 if d.get('travel_history') == 'Extensive (USA/UK/Schengen)' else 5 if d.get('travel_history') == 'Some regional travel' else 0},
+    {"id": "TR_TRAVEL_HISTORY", "category": "History", "type": "points", "spec": lookup('travel_history', {'Extensive (USA/UK/Schengen)': 10, 'Some regional travel': 5})},
 
     # 5. Mandatory Failures & Flags
-    {"id": "TR_FAIL_CRIMINAL_MISREP", "type": "mandatory_fail", "description": "History of criminal record or visa misrepresentation.", "logic": lambda d: d.get('has_criminal_record') or d.get('has_misrepresentation')},
-    {"id": "TR_FLAG_LONG_STAY", "type": "flag", "description": "Unusually long trip duration requested for a first-time tourist.", "logic": lambda d: d.get('trip_duration') > 30 and d.get('travel_history') != 'Extensive (USA/UK/Schengen)'},
-    {"id": "TR_FLAG_NO_HOST", "type": "flag", "description": "No host or hotel bookings can be a risk factor.", "logic": lambda d: not d.get('has_host_or_booking')},
-    {"id": "TR_FLAG_REFUSAL", "type": "flag", "description": "Previous visa refusal needs strong justification.", "logic": lambda d: d.get('has_previous_refusal')},
+    {"id": "TR_FAIL_CRIMINAL_MISREP", "type": "mandatory_fail", "description": "History of criminal record or visa misrepresentation.", "spec": truthy('has_criminal_record', 'has_misrepresentation')},
+    {"id": "TR_FLAG_LONG_STAY", "type": "flag", "description": "Unusually long trip duration requested for a first-time tourist.", "spec": expr(lambda trip_duration, travel_history: trip_duration > 30 and travel_history != 'Extensive (USA/UK/Schengen)', optional={'trip_duration': None, 'travel_history': None})},
+    {"id": "TR_FLAG_NO_HOST", "type": "flag", "description": "No host or hotel bookings can be a risk factor.", "spec": falsy('has_host_or_booking')},
+    {"id": "TR_FLAG_REFUSAL", "type": "flag", "description": "Previous visa refusal needs strong justification.", "spec": truthy('has_previous_refusal')},
 ]
 
+# Each declarative rule also gets a plain `logic` callable, so anything that runs
+# `rule['logic'](applicant_data)` keeps working unchanged.
+for _name, _rules in (("Skilled Worker", SKILLED_WORKER_RULES), ("Student Visa", STUDENT_VISA_RULES), ("Tourist Visa", TOURIST_VISA_RULES)):
+    with_compiled_logic(_rules)
+    instrumentation.register_rule_set(_name, _rules)  # labels for the optional per-rule metrics
+
 # --- UNIVERSAL EVALUATION ENGINE ---
 def evaluate_applicant(applicant_data, rules):
     """
     A universal engine that processes a list of rules against applicant data.
     It calculates points, identifies mandatory failures, and raises warning flags.
     """
+    if instrumentation.enabled and instrumentation.sample(rules):
+        return evaluate_instrumented(applicant_data, rules)
+
     total_points = 0
     points_breakdown = {}
     mandatory_failures = []
@@ -113,4 +128,52 @@ def evaluate_applicant(applicant_data, rules):
         "points_per_category": points_breakdown,
         "mandatory_failures": mandatory_failures,
         "warning_flags": warning_flags,
-    }
\ No newline at end of file
+    }
+
+
+# --- ELIGIBILITY STATUS ---
+PASS_SCORE, BORDERLINE_SCORE = 75, 50
+
+def classify_status(total_points, has_mandatory_failure):
+    """Maps a rule-engine result to the (status, color) shown to case officers."""
+    if has_mandatory_failure: return "INELIGIBLE (MANDATORY FAILURE)", "red"
+    elif total_points >= PASS_SCORE: return "LIKELY ELIGIBLE", "green"
+    elif total_points >= BORDERLINE_SCORE: return "BORDERLINE / FURTHER REVIEW NEEDED", "orange"
+    else: return "LIKELY INELIGIBLE", "red"
+
+
+# --- MODEL FEATURES ---
+# Feature order of the Skilled Worker model - MUST MATCH train_visa_model.py
+FEATURE_ORDER = [
+    'total_points', 'num_mandatory_failures', 'num_warning_flags',
+    'points_age', 'points_education', 'points_language', 'points_work', 'points_bonus'
+]
+
+def model_features(rule_engine_output):
+    """The model's feature vector (in FEATURE_ORDER) for one `evaluate_applicant` result."""
+    points = rule_engine_output['points_per_category']
+    return [rule_engine_output['total_points'], len(rule_engine_output['mandatory_failures']), len(rule_engine_output['warning_flags']),
+            points.get('Age', 0), points.get('Education', 0), points.get('Language', 0),
+            points.get('Work Experience', 0), points.get('Bonus', 0)]
+
+def model_feature_frame(batch_output):
+    """The model's feature matrix (FEATURE_ORDER columns) for an `evaluate_batch` result."""
+    import pandas as pd  # only batch callers pay for pandas
+    points = batch_output['points_per_category']
+    return pd.DataFrame({
+        'total_points': batch_output['total_points'],
+        'num_mandatory_failures': batch_output['mandatory_failures'].sum(axis=1),
+        'num_warning_flags': batch_output['warning_flags'].sum(axis=1),
+        'points_age': points.get('Age', 0),
+        'points_education': points.get('Education', 0),
+        'points_language': points.get('Language', 0),
+        'points_work': points.get('Work Experience', 0),
+        'points_bonus': points.get('Bonus', 0),
+    }, index=batch_output['total_points'].index)[FEATURE_ORDER]
+
+
+# --- COMPILED EVALUATORS ---
+# Drop-in replacements for `evaluate_applicant(data, <RULES>)` built by `compile_rules`.
+SKILLED_WORKER_EVALUATOR = compile_rules(SKILLED_WORKER_RULES)
+STUDENT_VISA_EVALUATOR = compile_rules(STUDENT_VISA_RULES)
+TOURIST_VISA_EVALUATOR = compile_rules(TOURIST_VISA_RULES)
\ No newline at end of file
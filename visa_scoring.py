@@ -0,0 +1,221 @@
+# visa_scoring.py
+"""
+Slim scoring core: rule sets, status classification, model features and model inference.
+
+Importing this module loads only the standard library and the rule engine, so short-lived
+workers and batch jobs can score without paying for Streamlit, plotly, pandas, NumPy or
+scikit-learn. The flat forest export (see flat_forest.export_flat_forest) is read with the
+standard library; the joblib model, pandas and NumPy are imported only if they are actually needed.
+
+    from visa_scoring import load_model, score
+    model = load_model()
+    result = score("Skilled Worker", applicant_data, model)
+
+    python visa_scoring.py --measure-startup     # cold-start comparison in fresh interpreters
+"""
+import ast
+import json
+import os
+import struct
+import sys
+from array import array
+
+from visa_rules_engine import (
+    SKILLED_WORKER_RULES, STUDENT_VISA_RULES, TOURIST_VISA_RULES,
+    SKILLED_WORKER_EVALUATOR, STUDENT_VISA_EVALUATOR, TOURIST_VISA_EVALUATOR,
+    PASS_SCORE, BORDERLINE_SCORE, FEATURE_ORDER, classify_status, model_features,
+)
+
+RULE_SETS = {"Skilled Worker": (SKILLED_WORKER_RULES, SKILLED_WORKER_EVALUATOR),
+             "Student Visa": (STUDENT_VISA_RULES, STUDENT_VISA_EVALUATOR),
+             "Tourist Visa": (TOURIST_VISA_RULES, TOURIST_VISA_EVALUATOR)}
+
+# .npy dtype -> array typecode, for the little-endian arrays written by export_flat_forest
+_TYPECODES = {"<i4": "i", "<f8": "d", "<i8": "q", "<f4": "f"}
+
+
+def read_npy(path):
+    """Reads a C-ordered little-endian .npy file into (array.array, shape) without NumPy."""
+    with open(path, "rb") as f:
+        if f.read(6) != b"\x93NUMPY":
+            raise ValueError(f"{path} is not a .npy file")
+        major = f.read(2)[0]
+        header_len = struct.unpack("<H" if major == 1 else "<I", f.read(2 if major == 1 else 4))[0]
+        header = ast.literal_eval(f.read(header_len).decode("latin-1"))
+        typecode = _TYPECODES.get(header["descr"])
+        if typecode is None or header["fortran_order"] or sys.byteorder != "little":
+            raise ValueError(f"{path}: unsupported array layout {header['descr']}")
+        data = array(typecode)
+        data.frombytes(f.read())
+    return data, header["shape"]
+
+
+# --- Model inference ---
+class CompactForest:
+    """
+    Pure-Python reader of the flat forest export, for single-applicant scoring. Gives the same
+    probabilities as `FlatForest` / the sklearn model (inputs are rounded to float32 like sklearn's).
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.feature_names = meta["feature_names"]
+        self.classes_ = meta["classes"]
+        self.feature = read_npy(os.path.join(path, "feature.npy"))[0]
+        self.threshold = read_npy(os.path.join(path, "threshold.npy"))[0]
+        self.left = read_npy(os.path.join(path, "left.npy"))[0]
+        self.right = read_npy(os.path.join(path, "right.npy"))[0]
+        self.value, shape = read_npy(os.path.join(path, "value.npy"))
+        self.n_classes = shape[1]
+        self.roots = read_npy(os.path.join(path, "roots.npy"))[0]
+
+    def predict_proba_row(self, row):
+        """Class probabilities for one feature vector (a sequence in feature order)."""
+        x = array("f", row).tolist()  # float32 rounding, as sklearn does
+        feature, threshold, left, right, value = self.feature, self.threshold, self.left, self.right, self.value
+        totals = [0.0] * self.n_classes
+        for node in self.roots:
+            child = left[node]
+            while child != node:
+                node = right[node] if x[feature[node]] > threshold[node] else child
+                child = left[node]
+            base = node * self.n_classes
+            for c in range(self.n_classes):
+                totals[c] += value[base + c]
+        return [total / len(self.roots) for total in totals]
+
+    def predict_proba_one(self, row):
+        """Probability of the positive class for one feature vector."""
+        return self.predict_proba_row(row)[-1]
+
+    def predict_proba(self, X):
+        """
+        sklearn-style (n_rows, n_classes) array for a 2-D sequence or a DataFrame, computed row by row
+        (imports NumPy; use flat_forest.FlatForest for big batches).
+        """
+        import numpy as np
+        if hasattr(X, "columns"):
+            X = X[self.feature_names].to_numpy()
+        return np.array([self.predict_proba_row(row) for row in X], dtype=np.float64).reshape(-1, self.n_classes)
+
+
+def load_model(flat_path="visa_model_flat", joblib_path="visa_model.joblib", batched=False):
+    """
+    The Skilled Worker model: the flat export read without NumPy if it exists, otherwise the joblib
+    model (which imports scikit-learn). Returns None when neither is available. With `batched`, the
+    export is memory-mapped as a flat_forest.FlatForest instead, for callers that score small batches
+    per call (up to a few hundred rows; for chunks of thousands, load the sklearn model with `flat_path=None`).
+    """
+    if flat_path and os.path.exists(os.path.join(flat_path, "meta.json")):
+        try:
+            if batched:
+                from flat_forest import FlatForest
+                return FlatForest.load(flat_path)
+            return CompactForest(flat_path)
+        except (OSError, ValueError, KeyError):
+            pass
+    if joblib_path and os.path.exists(joblib_path):
+        import joblib
+        return joblib.load(joblib_path)
+    return None
+
+
+def predict_probability(model, rule_engine_output):
+    """ML probability of eligibility for one rule-engine result."""
+    features = model_features(rule_engine_output)
+    if hasattr(model, "predict_proba_one"):
+        return model.predict_proba_one(features)
+    return predict_probabilities(model, [features])[0]
+
+
+def predict_probabilities(model, feature_rows):
+    """ML probabilities for a batch of `model_features` rows, in one `predict_proba` call."""
+    if hasattr(model, "feature_names_in_"):
+        # The sklearn model was fitted on a DataFrame and warns about (or misreads) bare arrays
+        import pandas as pd
+        feature_rows = pd.DataFrame(feature_rows, columns=FEATURE_ORDER)
+    return [float(p) for p in model.predict_proba(feature_rows)[:, 1]]
+
+
+def score(visa_category, applicant_data, model=None):
+    """
+    Full assessment of one applicant: the rule-engine result, status and color, the displayed score
+    (0 after a mandatory failure) and, for Skilled Worker with a model, the ML probability.
+    """
+    _, evaluate = RULE_SETS[visa_category]
+    rule_engine_output = evaluate(applicant_data)
+    has_failure = bool(rule_engine_output['mandatory_failures'])
+    status, color = classify_status(rule_engine_output['total_points'], has_failure)
+    probability = None
+    if visa_category == "Skilled Worker" and model is not None:
+        probability = predict_probability(model, rule_engine_output)
+    return {"rule_output": rule_engine_output, "status": status, "color": color,
+            "score": 0 if has_failure else rule_engine_output['total_points'], "ml_probability": probability}
+
+
+# --- Cold-start measurement ---
+# Each scenario runs in a fresh interpreter: `imports` is timed, then `first_score` scores one applicant.
+STARTUP_SCENARIOS = {
+    "before (pandas + joblib model, as app.py did)": (
+        "import pandas as pd; import joblib; from visa_rules_engine import SKILLED_WORKER_RULES, evaluate_applicant, classify_status, FEATURE_ORDER, model_features",
+        "model = joblib.load('visa_model.joblib'); out = evaluate_applicant(APPLICANT, SKILLED_WORKER_RULES); "
+        "classify_status(out['total_points'], bool(out['mandatory_failures'])); "
+        "model.predict_proba(pd.DataFrame([model_features(out)], columns=FEATURE_ORDER))[0][1]",
+    ),
+    "flat_forest (NumPy)": (
+        "from flat_forest import FlatForest; from visa_rules_engine import SKILLED_WORKER_EVALUATOR, classify_status, model_features",
+        "model = FlatForest.load('visa_model_flat'); out = SKILLED_WORKER_EVALUATOR(APPLICANT); "
+        "classify_status(out['total_points'], bool(out['mandatory_failures'])); model.predict_proba_one(model_features(out))",
+    ),
+    "after (visa_scoring)": (
+        "from visa_scoring import load_model, score",
+        "score('Skilled Worker', APPLICANT, load_model())",
+    ),
+}
+APPLICANT = {'age': 30, 'education_level': 'Masters', 'work_experience_years': 5, 'occupation_demand_level': 'High',
+             'ielts_listening': 7.5, 'ielts_reading': 7.0, 'ielts_writing': 7.0, 'ielts_speaking': 7.0, 'family_size': 1,
+             'settlement_funds': 25000, 'has_job_offer': False, 'has_relative': False, 'has_local_work_experience': False,
+             'has_positive_travel_history': True, 'has_criminal_record': False, 'has_previous_refusal': False}
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{imports}
+imported = time.perf_counter()
+APPLICANT = {applicant!r}
+{first_score}
+done = time.perf_counter()
+print(json.dumps({{"import_seconds": imported - start, "first_score_seconds": done - imported,
+                  "modules": len(sys.modules)}}))
+"""
+
+
+def measure_startup(runs=5):
+    """Median import and first-score latency of each STARTUP_SCENARIOS entry over `runs` fresh processes."""
+    import statistics
+    import subprocess
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for name, (imports, first_score) in STARTUP_SCENARIOS.items():
+        probe = _PROBE.format(imports=imports, first_score=first_score, applicant=APPLICANT)
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", probe], cwd=here, capture_output=True, text=True, check=True)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        results[name] = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Score one applicant, or measure cold-start latency.")
+    parser.add_argument("--measure-startup", action="store_true")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    if args.measure_startup:
+        for name, result in measure_startup(args.runs).items():
+            print(f"{name:<48} import {result['import_seconds'] * 1000:>8.1f} ms   first score "
+                  f"{result['first_score_seconds'] * 1000:>8.1f} ms   modules {result['modules']:>5}")
+    else:
+        result = score("Skilled Worker", APPLICANT, load_model())
+        print(json.dumps({key: value for key, value in result.items() if key != "rule_output"}, indent=2))